@@ -1,15 +1,34 @@
-import os, yt_dlp, json, mimetypes, re
-from requests import get, exceptions
+import os, yt_dlp, json, mimetypes, re, time, sqlite3, shutil, multiprocessing, base64, random
+from io import BytesIO, StringIO
+from contextlib import redirect_stdout
+from threading import Lock, Thread, local
+from queue import Queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from yt_dlp.postprocessor import FFmpegExtractAudioPP
+from requests import Session, exceptions
+from requests.adapters import HTTPAdapter
 from hashlib import sha256
 from PIL import Image
-from mutagen.id3 import ID3, ID3NoHeaderError, WOAS, TIT2, TPE1, TPUB, APIC, COMM
-from typing import Any, Tuple, List, Dict, Union
+from mutagen import File as MutagenFile
+from mutagen.id3 import ID3, ID3NoHeaderError, WOAS, TIT2, TPE1, TPUB, APIC, COMM, TXXX
+from mutagen.mp4 import MP4, MP4Cover, MP4FreeForm
+from mutagen.flac import FLAC, Picture
+from typing import Any, Callable, Iterable, Iterator, Tuple, List, Dict, TextIO, Union
 from colorama import Fore, init
 init(autoreset=True)
 
 HOME_DIR = os.path.expanduser("~")
+CACHE_DIR = os.path.join(HOME_DIR, ".ytAudioFetchCache")
 RETRY_LIMIT = 3
+RETRY_BASE_DELAY = 2 # seconds before the first retry, doubled for each retry after it
+RETRY_MAX_DELAY = 60
+CIRCUIT_FAILURE_LIMIT = 5 # temporary failures in a row, across all entries, before every request is paused
+CIRCUIT_COOLDOWN = 60 # seconds requests are paused for
 FILENAME_FORMAT = "YTAF-%(id)s-%(title)s.%(ext)s"
+SAVE_JOURNAL_EXT = ".journal" # appended to the save file path
+SQLITE_SAVE_EXTS = (".db", ".sqlite", ".sqlite3") # save files with these extensions use SQLiteSaveStore instead of JSON
+SAVE_READ_CHUNK_SIZE = 64*1024 # how much of a JSON save file is read at a time in JSON mode
 ID3_ALIASES = { # official ID3 tagnames: https://exiftool.org/TagNames/ID3.html#v2_4 or https://id3.org/id3v2-00
     "url": WOAS, # SourceURL
     "title": TIT2, # Title
@@ -18,19 +37,37 @@ ID3_ALIASES = { # official ID3 tagnames: https://exiftool.org/TagNames/ID3.html#
     "thumbnail": APIC, # Picture
     "description": COMM, # Comment
 }
+VORBIS_ALIASES = { # Vorbis comment names used by Opus, Ogg Vorbis and FLAC files: https://xiph.org/vorbis/doc/v-comment.html
+    "url": "WEBSITE",
+    "title": "TITLE",
+    "artist": "ARTIST",
+    "uploader": "ORGANIZATION", # closest thing to a publisher
+    "description": "COMMENT",
+}
+MP4_ALIASES = { # iTunes style atoms used by M4A files, "----" ones are freeform
+    "url": "----:com.apple.iTunes:WEBSITE",
+    "title": "\xa9nam",
+    "artist": "\xa9ART",
+    "uploader": "----:com.apple.iTunes:LABEL",
+    "description": "\xa9cmt",
+}
+AUDIO_CODEC_EXTS = {"mp3": "mp3", "m4a": "m4a", "opus": "opus", "vorbis": "ogg", "flac": "flac"} # FFmpegExtractAudio codec -> file extension
+NATIVE_AUDIO_EXTS = ("opus", "m4a", "ogg", "flac", "mp3") # what the "best" codec keeps YouTube's audio in, all of which can be tagged
+MP3_BITRATES = (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320) # the constant bitrates (kbps) an MP3 can be encoded at
+TAG_PADDING = 64*1024 # bytes of padding given to tags that outgrow theirs, so later retags and cover swaps fit without rewriting the file
+TAG_FINGERPRINT_DESC = "ytAudioFetch fingerprint" # TXXX frame of the tags last written, so unchanged files aren't rewritten
+TAGS_UP_TO_DATE = "Skipped Tagging (Tags are already up to date)" # the addTags result of a file whose fingerprint matched, which counts as tagged
+VORBIS_FINGERPRINT_KEY = "YTAUDIOFETCH_FINGERPRINT" # the same for Vorbis comments
+MP4_FINGERPRINT_KEY = "----:com.ytAudioFetch:fingerprint" # and MP4 atoms
 def hook(d: Dict[str, Any]) -> None:
     if d["status"] == "finished": print("  [dl hook] Finished downloading info of", d['info_dict']['title'], end="")
 YDL_VERBOSE_EXTRACTION_OPTS = {
     "format": "bestaudio/best",
-    "extractaudio": True,
-    "audioformat": "mp3",
     "outtmpl": FILENAME_FORMAT,
-    "concurrent-fragments": 4,
-    "restrict-filenames": True,
     "postprocessors": [{
         "key": "FFmpegExtractAudio",
         "preferredcodec": "mp3",
-        "preferredquality": "320", # the highest I found youtube goes is 320
+        "preferredquality": "320", # the highest I found youtube goes is 320, lowered to the source's bitrate when matchBitrate is on
     }],
     "quiet": False,
     "progress_hooks": [hook],
@@ -39,18 +76,43 @@ YDL_CONCISE_EXTRACTION_OPTS = { # For single videos extraction both of these opt
     "extract_flat": True,
     "outtmpl": FILENAME_FORMAT
 }
+DOWNLOAD_TUNING = { # defaults for the downloadTuning argument
+    "fragments": 4, # fragments of a fragmented (DASH/HLS) format downloaded at the same time
+    "chunkSize": 10*1024*1024, # bytes requested at a time from plain HTTP formats, YouTube throttles ones requested all at once. 0 for no chunks
+    "socketTimeout": 20, # seconds to wait on a stalled connection
+}
+RATE_LIMITS = { # defaults for the rateLimits argument, requests per second and how many can go at once after a quiet period
+    "metadata": {"rate": 2, "burst": 10}, # info extraction from YouTube
+    "media": {"rate": 1, "burst": 5}, # audio downloads
+    "thumbnail": {"rate": 10, "burst": 20}, # thumbnail downloads, which come from a different host
+}
+ERROR_PHRASES = { # how classifyError recognizes errors that are worth retrying, anything else is permanent
+    "throttled": ["HTTP Error 429", "Too Many Requests", "confirm you're not a bot", "confirm you’re not a bot"],
+    "temporary": [
+        "Failed to resolve", "Failed to extract", "timed out", "Connection reset", "Connection refused", "Connection aborted",
+        "Remote end closed", "Temporary failure", "Network is unreachable", "IncompleteRead", "Unable to connect to proxy",
+        "HTTP Error 500", "HTTP Error 502", "HTTP Error 503", "HTTP Error 504",
+    ],
+}
+HTTP_SESSION = Session() # shared so thumbnail downloads reuse kept alive connections instead of a new TCP+TLS handshake each time
+HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+HTTP_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+THUMBNAIL_TIMEOUT = (10, 30) # seconds to connect and between received bytes
+THUMBNAIL_CHUNK_SIZE = 64*1024
 
 
 #URL MODE
 def ytafURL(arguments: Dict) -> List[Tuple[str, str]]:
     """
-    Downloads audio from a YouTube URL and saves it to the specified directory.
+    Downloads audio from YouTube URLs and saves it to the specified directory.
     
     Args:
         arguments (Dict): A dictionary containing the following keys:
             ytURL (str): The URL of the YouTube video or playlist.
+            ytURLs (List[str], optional): Several video/playlist URLs to process in one run instead of ytURL. Videos in more than one of them are only processed once.
             outputDir (str): The directory where the audio will be saved.
-            saveFilePath (str, optional): The path to the save file. Defaults to ~/.ytAudioFetchSave.json.
+            saveFilePath (str, optional): The path to the save file. Defaults to ~/.ytAudioFetchSave.json. Paths ending in .db, .sqlite or .sqlite3 are saved to an SQLite database instead.
+            saveCompactEvery (int, optional): How many saved entries are journaled before the journal is merged into a JSON save file. Defaults to 100.
             downloading (bool, optional): Whether to download the audio file. Defaults to True.
             tagging (bool, optional): Whether to tag the audio file. Defaults to True.
             saving (bool, optional): Whether to save the tag data to a JSON file. Defaults to True.
@@ -63,63 +125,147 @@ def ytafURL(arguments: Dict) -> List[Tuple[str, str]]:
             coverQuality (int, optional): The quality of the cover image. Defaults to 75. Values above 95 result in higher file sizes with a diminishing return on quality.
             overwriteSave (bool, optional): Whether to overwrite the save file if it already exists. Defaults to False.
             verboseSkipList (bool, optional): Whether to print all operations that were skipped or just downloads. Defaults to False.
+            maxWorkers (int, optional): The number of entries to process at the same time. Defaults to 1 (one after another).
+            pipeline (bool, optional): Whether to split processing into download, transcode and tag stages that run at the same time. Overrides maxWorkers. Defaults to False.
+            stageWorkers (Dict[str, int], optional): The number of workers for each of the "download", "transcode" and "tag" stages. Defaults to 2, transcodeWorkers and 1.
+            transcodeWorkers (int, optional): The number of conversions the pipeline's transcode stage runs at the same time. Defaults to the number of CPU cores.
+            stageQueueSize (int, optional): The number of entries that can wait between two stages before the earlier stage pauses. Defaults to 8.
+            metadataCachePath (str, optional): The path to the cache of verbose video info, so already fetched videos don't need to be extracted again. Defaults to ~/.ytAudioFetchCache/metadata.json. None or "" to not use a cache.
+            metadataCacheTTL (int, optional): How many seconds cached video info stays valid for. Defaults to 30 days.
+            metadataCacheSize (int, optional): The maximum number of videos kept in the cache, least recently used ones are removed first. Defaults to 20000.
+            coverCacheDir (str, optional): The directory where downloaded and compressed thumbnails are cached so they can be reused. Defaults to ~/.ytAudioFetchCache/covers. None or "" to not use a cache.
+            coverCacheSize (int, optional): The maximum size of the cover cache in bytes, least recently used covers are removed first. Defaults to 256 MiB.
+            prefetchDepth (int, optional): How many thumbnails can be downloaded in the background ahead of being tagged. Defaults to 4. 0 to not prefetch.
+            archiveFilePath (str, optional): The path to an archive of every video's audio file across all output directories, so a video already downloaded elsewhere is hard linked (or copied) instead of downloaded again. Linked files share their tags. Defaults to None which means no archive.
+            checkpointDir (str, optional): The directory where the progress of each playlist and output directory is kept while it runs, so an interrupted run picks up where it stopped. Defaults to ~/.ytAudioFetchCache/checkpoints. None or "" to not checkpoint.
+            tagPadding (int, optional): The bytes of padding added when a tag doesn't fit in the file's existing padding, so later retags can be written in place. Defaults to 64 KiB.
+            audioFormat (str, optional): "mp3" to convert the audio to MP3 or "native" to keep YouTube's original audio without transcoding it, remuxed into an .opus, .m4a, .ogg or .flac file that can be tagged. Defaults to "mp3".
+            matchBitrate (bool, optional): Whether MP3s are encoded at the lowest bitrate that's at least the source audio's instead of always 320 kbps. Defaults to True.
+            downloadTuning (Dict[str, Any], optional): Overrides for any of the DOWNLOAD_TUNING keys: fragments, chunkSize and socketTimeout.
+            rateLimits (Dict[str, Dict[str, float]], optional): Overrides for the "metadata", "media" and "thumbnail" request budgets in RATE_LIMITS, each a {"rate": requests per second, "burst": requests} or None for no limit.
+            lazyPlaylist (bool, optional): Whether playlist entries are processed as each page of the playlist is listed instead of after all of it is, which also means the number of videos isn't known. Defaults to False.
+            incrementalSync (bool, optional): Whether each playlist is compared to a snapshot of its last sync (with at least the same downloading, tagging, saving and changeableTags) so only videos that were added or whose title/duration changed are processed. Files removed from the output directory since then aren't noticed. Defaults to False.
+            snapshotDir (str, optional): The directory where incrementalSync keeps the snapshot of each playlist and output directory. Defaults to ~/.ytAudioFetchCache/snapshots.
+            reportRemovals (bool, optional): Whether videos removed from a playlist since its last sync are added to the skip list. Only used with incrementalSync. Defaults to False.
     Returns:
         List[Tuple[str, str]]: A list of tuples each containing the link to a skipped video/playlist and the reason for skipping.
     """
     # Validate and prepare input arguments
-    params = validateAndPrepareArgsURL(arguments)
-    if params is None: return []
-    ( ytURL, outputDir, downloading, tagging, saving, replacingFiles,
-      proxyURL, tagExisting, changeableTags, clearCovers, coverDir,
-      coverQuality, overwriteSave, saveFilePath, verboseSkipList ) = params
+    options = validateAndPrepareArgsURL(arguments)
+    if options is None: return []
+    outputDir, saving, lazyPlaylist, snapshotDir = options["outputDir"], options["saving"], options["lazyPlaylist"], options["snapshotDir"]
+    setRateLimits(options["rateLimits"])
+    CIRCUIT_BREAKER.reset()
     skipList = []
     
     # Extract basic info (with retry logic)
-    info = extractBasicInfo(ytURL, outputDir, skipList)
-    if skipList: return skipList # This trigger only when skipList is not empty -> extraction of anythng failed -> no need to continue
-    numVideos = len(info.get('entries', []))
+    entryLists, snapshots = [], []
+    for ytURL in options["ytURLs"]:
+        skipCount = len(skipList)
+        info = extractBasicInfo(ytURL, outputDir, skipList, lazyPlaylist)
+        if len(skipList) != skipCount: continue # a URL that failed to extract adds to the skip list
+        entryList = info.get("entries", [])
+        if snapshotDir:
+            snapshots.append(PlaylistSnapshot(snapshotDir, ytURL, outputDir, options["operations"]))
+            entryList = snapshots[-1].diff(entryList)
+            if not lazyPlaylist: # a lazy playlist's changes are only known once it's listed
+                entryList = list(entryList)
+                print(Fore.YELLOW + f"{snapshots[-1].unchanged} video(s) unchanged since the last sync of {ytURL}, {len(entryList)} new or changed")
+        entryLists.append(entryList)
+    if not entryLists: return skipList # extraction of everything failed -> no need to continue
+    
+    entries = uniqueEntries(entryLists)
+    if all(isinstance(entryList, list) for entryList in entryLists):
+        entries = list(entries)
+        duplicates = sum(map(len, entryLists)) - len(entries)
+        if duplicates: print(Fore.YELLOW + f"{duplicates} video(s) are in more than one playlist, they'll only be processed once")
+    videoCount = f" of {len(entries)}" if isinstance(entries, list) else "" # a lazy playlist isn't counted until it's done
     
     # Setup ydl options for verbose download/tagging operations
     ydlOpts = YDL_VERBOSE_EXTRACTION_OPTS.copy()
     ydlOpts["outtmpl"] = os.path.join(outputDir, ydlOpts["outtmpl"])
-    if proxyURL: ydlOpts["proxy"] = proxyURL
+    if options["proxyURL"]: ydlOpts["proxy"] = options["proxyURL"]
+    if options["audioFormat"] == "native": ydlOpts["postprocessors"] = [{"key": "FFmpegExtractAudio", "preferredcodec": "best"}] # copies the audio stream as is
+    applyDownloadTuning(ydlOpts, options["downloadTuning"])
     
     # Load save data
+    saveFilePath, saveCompactEvery = options["saveFilePath"], options["saveCompactEvery"]
     if saving:
-        errorType, saveData = loadSaveData(saveFilePath)
+        errorType, saveData = loadSaveStore(saveFilePath, saveCompactEvery)
 
         if errorType == 1:
             oldSaveFilePath = saveFilePath
             saveBase = os.path.basename(oldSaveFilePath)
             saveFilePath = os.path.join(os.path.dirname(oldSaveFilePath), "YTAF-NEW-"+saveBase)
             print(Fore.YELLOW + "Bad save file detected, data will now be saved to:", saveFilePath)
-            addToSkipList(skipList, oldSaveFilePath, f"Error loading save file so fallback to: {saveFilePath}. Check if orginal JSON file is valid/formatted correctly.")
+            addToSkipList(skipList, oldSaveFilePath, f"Error loading save file so fallback to: {saveFilePath}. Check if orginal save file is valid/formatted correctly.")
+            saveData = SQLiteSaveStore(saveFilePath) if saveFilePath.lower().endswith(SQLITE_SAVE_EXTS) else JSONSaveStore(saveFilePath, {}, saveCompactEvery)
         
-    else: saveData = {}
+    else: saveData = JSONSaveStore(None, {})
+
+    # The services every entry shares, added to the options so they're passed along with them
+    prefetcher = ThumbnailPrefetcher(options["prefetchDepth"], options["coverCache"], options["coverQuality"]) if options["prefetchDepth"] else None
+    options["prefetcher"] = prefetcher
+    options["outputIndex"] = OutputDirIndex(outputDir, getOutputExts(ydlOpts))
+    options["transcodeReport"] = TranscodeReport()
+    options["syncedIDs"] = set() # videos that got through every operation, so the snapshots can move on from them
+    options["coverOptions"] = {key: options[key] for key in ("clearCovers", "coverDir", "coverQuality", "coverCache", "prefetcher", "tagPadding")}
     
-    print()
-    for i, entry in enumerate(info.get("entries", []), start=1): # Process each entry in the info
-        print(Fore.BLUE + f"Video {i} of {numVideos}", "-", entry['url'])
-        processEntryURL(
-            entry, ydlOpts, saveData, downloading, tagging,
-            saving, replacingFiles, tagExisting, changeableTags,
-            clearCovers, coverDir, coverQuality, overwriteSave,
-            skipList, verboseSkipList
-        )
+    def processEntry(i: int, entry: Dict[str, Any], entrySkipList: List[Tuple[str, str]]) -> None:
+        print(Fore.BLUE + f"Video {i}{videoCount}", "-", entry['url'])
+        processEntryURL(entry, ydlOpts, saveData, options, entrySkipList)
         print("\n")
-    else: print(Fore.BLUE + "Processing of all entries complete")
+
+    # Pipeline stages, each one takes what the previous one returned
+    def downloadStage(item: Tuple[int, Dict[str, Any]], entrySkipList: List[Tuple[str, str]]) -> Union[Dict[str, Any], None]:
+        i, entry = item
+        print(Fore.BLUE + f"Video {i}{videoCount}", "-", entry['url'])
+        job = planEntryURL(entry, ydlOpts, saveData, options, entrySkipList)
+        if job is None or not fetchEntryURL(job, ydlOpts, entrySkipList, options["metadataCache"], prefetcher): return None
+        return job
+    def transcodeStage(job: Dict[str, Any], entrySkipList: List[Tuple[str, str]]) -> Union[Dict[str, Any], None]:
+        return job if transcodeEntryURL(job, ydlOpts, entrySkipList, options["matchBitrate"], options["transcodeReport"]) else None
+    def tagStage(job: Dict[str, Any], entrySkipList: List[Tuple[str, str]]) -> None:
+        finishEntryURL(job, saveData, options["changeableTags"], options["coverOptions"], entrySkipList, options["verboseSkipList"])
+
+    print()
+    if options["pipeline"]:
+        stageWorkers = options["stageWorkers"]
+        stages = [(downloadStage, stageWorkers["download"]), (transcodeStage, stageWorkers["transcode"]), (tagStage, stageWorkers["tag"])]
+        processEntriesPipelined(entries, stages, options["stageQueueSize"], skipList)
+    elif options["maxWorkers"] > 1: processEntriesConcurrently(entries, processEntry, options["maxWorkers"], skipList)
+    else:
+        for i, entry in enumerate(entries, start=1): processEntry(i, entry, skipList) # Process each entry in the info
+    print(Fore.BLUE + "Processing of all entries complete")
+    options["transcodeReport"].report()
+    
+    listingFailures = {url for url, _ in skipList}
+    for snapshot in snapshots:
+        complete = snapshot.ytURL not in listingFailures # a lazy playlist whose listing stopped early didn't see every video
+        if lazyPlaylist: print(Fore.YELLOW + f"{snapshot.unchanged} video(s) unchanged since the last sync of {snapshot.ytURL}")
+        if options["reportRemovals"] and complete:
+            for videoID, title in snapshot.removed():
+                print(Fore.YELLOW + f"Removed from {snapshot.ytURL} since the last sync:", title)
+                addToSkipList(skipList, f"https://www.youtube.com/watch?v={videoID}", f"Removed from playlist since the last sync ~ {title}")
+        snapshot.save(options["syncedIDs"], complete)
     
     if saving:
-        with open(saveFilePath, "w") as saveFile: json.dump(saveData, saveFile, indent=4)
+        saveData.close()
         print(Fore.GREEN + "All data has been properly saved to:", saveFilePath)
 
+    if options["checkpoint"]: options["checkpoint"].finish() # every entry got its turn so the next run starts from the beginning again
+    if options["archive"]: options["archive"].save()
+    if options["metadataCache"]: options["metadataCache"].save()
+    if prefetcher: prefetcher.close()
+    YDL_POOL.close()
     return skipList
 
-def validateAndPrepareArgsURL(arguments: Dict) -> Tuple[str, str, bool, bool, bool, bool, str, bool, List[str], bool, str, int, bool, str, bool]:
-    """Validates and prepares the input arguments for the ytafURL function."""
-    ytURL = arguments.get("ytURL")
+def validateAndPrepareArgsURL(arguments: Dict) -> Union[Dict[str, Any], None]:
+    """Validates and prepares the input arguments for the ytafURL function, returning them as the options passed to processEntryURL."""
+    ytURLs = arguments.get("ytURLs") or ([arguments["ytURL"]] if arguments.get("ytURL") else [])
+    ytURLs = list(dict.fromkeys(ytURLs)) # the same URL twice would just be listed twice
     outputDir = arguments.get("outputDir")
-    if not ytURL: raise ValueError("ytURL is required in argument dictionary")
+    if not ytURLs: raise ValueError("ytURL or ytURLs is required in argument dictionary")
     if not outputDir: raise ValueError("outputDir is required in argument dictionary")
     
     downloading = arguments.get("downloading", True)
@@ -137,6 +283,14 @@ def validateAndPrepareArgsURL(arguments: Dict) -> Tuple[str, str, bool, bool, bo
     # download specific
     replacingFiles = arguments.get("replacingFiles", False)
     proxyURL = arguments.get("proxyURL", "")
+    audioFormat = arguments.get("audioFormat", "mp3")
+    if audioFormat not in ("mp3", "native"): raise ValueError('audioFormat must be "mp3" or "native"')
+    matchBitrate = arguments.get("matchBitrate", True)
+    downloadTuning = validateDownloadTuning(arguments)
+    rateLimits = validateRateLimits(arguments)
+    lazyPlaylist = arguments.get("lazyPlaylist", False)
+    incrementalSync = arguments.get("incrementalSync", False)
+    reportRemovals = arguments.get("reportRemovals", False)
 
     # tag specific (this includes changeableTags)
     tagExisting = arguments.get("tagExisting", False)
@@ -149,20 +303,130 @@ def validateAndPrepareArgsURL(arguments: Dict) -> Tuple[str, str, bool, bool, bo
     # save specific
     overwriteSave = arguments.get("overwriteSave", False)
     saveFilePath = os.path.expanduser( arguments.get("saveFilePath", os.path.join(HOME_DIR, ".ytAudioFetchSave.json")))
+    saveCompactEvery = arguments.get("saveCompactEvery", 100)
+    if not isinstance(saveCompactEvery, int) or saveCompactEvery < 1: raise ValueError("saveCompactEvery must be a positive integer")
     
     verboseSkipList = arguments.get("verboseSkipList", False)
 
+    # concurrency
+    maxWorkers = arguments.get("maxWorkers", 1)
+    if not isinstance(maxWorkers, int) or maxWorkers < 1: raise ValueError("maxWorkers must be a positive integer")
+    pipeline = arguments.get("pipeline", False)
+    # Each transcode worker thread waits on its own FFmpeg process, so one per core keeps every core converting
+    transcodeWorkers = arguments.get("transcodeWorkers", os.cpu_count() or 1)
+    if not isinstance(transcodeWorkers, int) or transcodeWorkers < 1: raise ValueError("transcodeWorkers must be a positive integer")
+    stageWorkers = {"download": 2, "transcode": transcodeWorkers, "tag": 1}
+    stageWorkers.update(arguments.get("stageWorkers", {}))
+    if set(stageWorkers) != {"download", "transcode", "tag"}: raise ValueError("stageWorkers can only have the keys download, transcode and tag")
+    if not all(isinstance(count, int) and count >= 1 for count in stageWorkers.values()): raise ValueError("stageWorkers counts must be positive integers")
+    stageQueueSize = arguments.get("stageQueueSize", 8)
+    if not isinstance(stageQueueSize, int) or stageQueueSize < 1: raise ValueError("stageQueueSize must be a positive integer")
+
+    # metadata cache
+    metadataCachePath = arguments.get("metadataCachePath", os.path.join(CACHE_DIR, "metadata.json"))
+    metadataCacheTTL = arguments.get("metadataCacheTTL", 30*24*60*60)
+    metadataCacheSize = arguments.get("metadataCacheSize", 20000)
+    if metadataCacheTTL < 0 or metadataCacheSize < 1: raise ValueError("metadataCacheTTL can't be negative and metadataCacheSize must be positive")
+    metadataCache = MetadataCache(os.path.expanduser(metadataCachePath), metadataCacheTTL, metadataCacheSize) if metadataCachePath else None
+    coverCache = prepareCoverCache(arguments)
+    prefetchDepth = validatePrefetchDepth(arguments)
+    tagPadding = validateTagPadding(arguments)
+
     # Normalize paths
     outputDir = os.path.expanduser(outputDir)
     coverDir = os.path.expanduser(coverDir)
     os.makedirs(outputDir, exist_ok=True)
     if coverDir: os.makedirs(coverDir, exist_ok=True)
+
+    # What the run does, so a checkpoint or snapshot left by a run that did less isn't taken as this one's
+    operations = {"downloading": downloading, "tagging": tagging, "saving": saving, "changeableTags": sorted(changeableTags)}
+    checkpointDir = arguments.get("checkpointDir", os.path.join(CACHE_DIR, "checkpoints"))
+    checkpoint = RunCheckpoint(os.path.expanduser(checkpointDir), "\n".join(ytURLs), outputDir, operations) if checkpointDir else None
+    archiveFilePath = arguments.get("archiveFilePath")
+    archive = DownloadArchive(os.path.expanduser(archiveFilePath)) if archiveFilePath else None
+    snapshotDir = os.path.expanduser(arguments.get("snapshotDir") or os.path.join(CACHE_DIR, "snapshots")) if incrementalSync else None
     
-    return ytURL, outputDir, downloading, tagging, saving, replacingFiles, \
-           proxyURL, tagExisting, changeableTags, clearCovers, coverDir, \
-           coverQuality, overwriteSave, saveFilePath, verboseSkipList
+    return {
+        "ytURLs": ytURLs, "outputDir": outputDir, "downloading": downloading, "tagging": tagging, "saving": saving,
+        "replacingFiles": replacingFiles, "proxyURL": proxyURL, "tagExisting": tagExisting, "changeableTags": changeableTags,
+        "clearCovers": clearCovers, "coverDir": coverDir, "coverQuality": coverQuality, "overwriteSave": overwriteSave,
+        "saveFilePath": saveFilePath, "saveCompactEvery": saveCompactEvery, "verboseSkipList": verboseSkipList,
+        "maxWorkers": maxWorkers, "pipeline": pipeline, "stageWorkers": stageWorkers, "stageQueueSize": stageQueueSize,
+        "metadataCache": metadataCache, "coverCache": coverCache, "prefetchDepth": prefetchDepth, "checkpoint": checkpoint,
+        "archive": archive, "tagPadding": tagPadding, "audioFormat": audioFormat, "matchBitrate": matchBitrate,
+        "downloadTuning": downloadTuning, "rateLimits": rateLimits, "lazyPlaylist": lazyPlaylist,
+        "snapshotDir": snapshotDir, "reportRemovals": reportRemovals, "operations": operations
+    }
+
+def processEntriesConcurrently(entries: Iterable[Dict[str, Any]], processEntry: Callable[[int, Dict[str, Any], List[Tuple[str, str]]], None],
+                               maxWorkers: int, skipList: List[Tuple[str, str]]) -> None:
+    """
+    Runs processEntry over all entries using a bounded pool of worker threads.
+    Threads are used since the work is mostly waiting on the network or on FFmpeg, which runs as its own process.
+    
+    Args:
+        entries (Iterable[Dict[str, Any]]): The entries to process, only read a few ahead of the ones being processed.
+        processEntry (Callable): Called with the 1-based index of the entry, the entry and the skip list to add to.
+        maxWorkers (int): The maximum number of entries processed at the same time.
+        skipList (List[Tuple[str, str]]): The skip list that every entry's skips are added to once all entries are done.
+    """
+    # Each entry gets its own skip list so the final list stays in playlist order no matter which entry finishes first
+    entrySkipLists = []
+    with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        futures = deque()
+        for i, entry in enumerate(entries, start=1):
+            entrySkipLists.append([])
+            futures.append(executor.submit(processEntry, i, entry, entrySkipLists[-1]))
+            if len(futures) >= 2*maxWorkers: futures.popleft().result() # so a lazy playlist isn't read all at once
+        for future in futures: future.result() # re-raises any exception from the worker thread
+    
+    for entrySkipList in entrySkipLists: skipList.extend(entrySkipList)
+
+def processEntriesPipelined(entries: Iterable[Dict[str, Any]], stages: List[Tuple[Callable[[Any, List[Tuple[str, str]]], Any], int]],
+                            queueSize: int, skipList: List[Tuple[str, str]]) -> None:
+    """
+    Runs entries through a series of stages that work at the same time, e.g. downloading one entry while converting another.
+    Stages are connected by bounded queues so a slow stage makes the ones before it wait instead of piling up finished work.
+    
+    Args:
+        entries (Iterable[Dict[str, Any]]): The entries to process, only read as the first stage takes them.
+        stages (List[Tuple[Callable, int]]): Each stage's function and number of worker threads. The first stage gets (index, entry) and every
+            later stage gets what the previous one returned. Returning None drops the entry from the rest of the stages.
+        queueSize (int): The maximum number of entries waiting in front of each stage.
+        skipList (List[Tuple[str, str]]): The skip list that every entry's skips are added to once all entries are done.
+    """
+    queues = [Queue(maxsize=queueSize) for _ in stages]
+    entrySkipLists = [] # one per entry so the final list stays in playlist order
+
+    def runStage(stageIndex: int) -> None:
+        stage, inQueue = stages[stageIndex][0], queues[stageIndex]
+        outQueue = queues[stageIndex+1] if stageIndex+1 < len(stages) else None
+        while (item := inQueue.get()) is not None:
+            url, value, entrySkipList = item
+            try: result = stage(value, entrySkipList)
+            except Exception as e: # a dead worker would stall the whole pipeline, so only this entry is dropped
+                print(Fore.RED + f"Unexpected error processing {url}:", e)
+                addToSkipList(entrySkipList, url, f"Unexpected error ~ {e}")
+                continue
+            if result is not None and outQueue is not None: outQueue.put((url, result, entrySkipList))
+
+    workers = []
+    for stageIndex, (_, numWorkers) in enumerate(stages):
+        workers.append([Thread(target=runStage, args=(stageIndex,), daemon=True) for _ in range(numWorkers)])
+        for worker in workers[-1]: worker.start()
+
+    for i, entry in enumerate(entries, start=1):
+        entrySkipLists.append([])
+        queues[0].put((entry.get("url"), (i, entry), entrySkipLists[-1])) # blocks while the first stage is backed up
+    
+    # Stop each stage only after the one before it is done, so nothing is still being handed to it
+    for stageQueue, stageWorkers in zip(queues, workers):
+        for _ in stageWorkers: stageQueue.put(None)
+        for worker in stageWorkers: worker.join()
+    
+    for entrySkipList in entrySkipLists: skipList.extend(entrySkipList)
 
-def extractBasicInfo(ytURL: str, outputDir: str, skipList: List[Tuple[str, str]]) -> Dict:
+def extractBasicInfo(ytURL: str, outputDir: str, skipList: List[Tuple[str, str]], lazy: bool = False) -> Dict:
     """
     Downloads basic info of a YouTube playlist/video and normalizes it to a playlist-like structure.
     Significantly faster than extracting the info with the base flags and allows for really fast checking of repeat video.
@@ -171,6 +435,7 @@ def extractBasicInfo(ytURL: str, outputDir: str, skipList: List[Tuple[str, str]]
         ytURL (str): The URL of the YouTube playlist/video.
         outputDir (str): The path to the output directory.
         skipList (List[Tuple[str, str]]): A list of tuples where the first element is a YouTube URL and the second element is the reason why it was skipped.
+        lazy (bool, optional): Whether a playlist's entries are an iterator that lists each page as it's reached instead of a list. Defaults to False.
     
     Returns:
         Dict: A dictionary containing the basic info of the playlist/video.
@@ -178,29 +443,24 @@ def extractBasicInfo(ytURL: str, outputDir: str, skipList: List[Tuple[str, str]]
     ydlOpts = YDL_CONCISE_EXTRACTION_OPTS.copy()
     ydlOpts["outtmpl"] = os.path.join(outputDir, ydlOpts["outtmpl"])
     
-    with yt_dlp.YoutubeDL(ydlOpts) as ydl:
-        for i in range(RETRY_LIMIT):
-            try:
-                info = ydl.extract_info(ytURL, download=False)
-                break
-            except yt_dlp.utils.DownloadError as e:
-                extractionError = e
-                # Check for non-connection errors on first try
-                if i == 0 and not isConnectionError(extractionError):
-                    addToSkipList(skipList, ytURL, extractionError)
-                    info = {"entries": []}
-                    break
-                else:
-                    print(Fore.RED + f"Error extracting: {extractionError}")
-                    if i < RETRY_LIMIT - 1:
-                        print(Fore.YELLOW + "Retrying...")
-        else:
-            print(Fore.RED + f"Failed to extract information for {ytURL}")
-            addToSkipList(skipList, ytURL, extractionError)
-            info = {"entries": []}
+    ydl = YDL_POOL.get(ydlOpts)
+    def extract() -> Dict:
+        waitForRateLimit("metadata")
+        # Unprocessed, a playlist's entries are the extractor's own generator which fetches the next page only when it's reached
+        info = ydl.extract_info(ytURL, download=False, process=not lazy)
+        if info.get("_type") in ("url", "url_transparent"): # the URL redirects to another one, which only processing follows
+            info = ydl.process_ie_result(info, download=False)
+        return info
+    try:
+        info = retryCall(extract, "extracting")
+        if lazy and info.get("entries") is not None and not isinstance(info["entries"], list): info["entries"] = iterLazyEntries(info["entries"], ytURL, skipList)
+    except yt_dlp.utils.DownloadError as extractionError:
+        if classifyError(extractionError) != "permanent": print(Fore.RED + f"Failed to extract information for {ytURL}")
+        addToSkipList(skipList, ytURL, extractionError)
+        info = {"entries": []}
     
-    # playlists have the basename: "playlist" 
-    if info.get("webpage_url_basename") == "watch" and not skipList:
+    # playlists have the basename: "playlist" (and failed extractions have neither)
+    if info.get("webpage_url_basename") == "watch":
         # Normalize single video to a playlist-like structure
         info["url"] = info["webpage_url"]
         info = {"entries": [info]}
@@ -209,116 +469,297 @@ def extractBasicInfo(ytURL: str, outputDir: str, skipList: List[Tuple[str, str]]
     # for entry in info.get("entries", []): print("\n".join(f"{key}: {value}" for key, value in entry.items()),end="\n\n")
     return info
 
-def processEntryURL(entry: Dict[str, Any], ydlOpts: Dict[str, Any], saveData: Dict[str, Dict[str, str]], downloading: bool,
-                    tagging: bool, saving: bool, replacingFiles: bool, tagExisting: bool, changeableTags: List[str], clearCovers: bool,
-                    coverDir: str, coverQuality: int, overwriteSave: bool, skipList: List[Tuple[str, str]], verboseSkipList: bool) -> None:
+def uniqueEntries(entryLists: List[Iterable[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    """Chains the entries of several playlists, leaving out videos an earlier entry already had so every video is only processed once."""
+    seenIDs = set()
+    for entries in entryLists:
+        for entry in entries:
+            videoID = entry.get("id")
+            if videoID:
+                if videoID in seenIDs: continue
+                seenIDs.add(videoID)
+            yield entry
+
+def iterLazyEntries(entries: Iterable[Dict[str, Any]], ytURL: str, skipList: List[Tuple[str, str]]) -> Iterator[Dict[str, Any]]:
+    """Yields the entries of a lazily listed playlist, stopping with a skip list entry if a page of it can't be listed."""
+    try:
+        yield from entries
+    except (yt_dlp.utils.ExtractorError, yt_dlp.utils.DownloadError) as e:
+        error = getattr(e, "orig_msg", None) or e # without yt-dlp's bug report boilerplate
+        print(Fore.RED + f"Failed to list the rest of {ytURL}:", error)
+        addToSkipList(skipList, ytURL, f"Playlist listing stopped early ~ {error}")
+
+def processEntryURL(entry: Dict[str, Any], ydlOpts: Dict[str, Any], saveData: Union["JSONSaveStore", "SQLiteSaveStore"], options: Dict[str, Any],
+                    skipList: List[Tuple[str, str]]) -> None:
     """
     Processes a single entry in a playlist.
     
     Args:
         entry (Dict[str, Any]): A dictionary containing the info of the YouTube video.
         ydlOpts (Dict[str, Any]): A dictionary of options for the yt-dlp YoutubeDL object.
-        saveData (Dict[str, Dict[str, str]]): A dictionary containing existing save data.
-        downloading (bool): Whether to download the audio file.
-        tagging (bool): Whether to tag the audio file.
-        saving (bool): Whether to save the tag data to a JSON file.
-        replacingFiles (bool): Whether to replace the audio file if it already exists.
-        tagExisting (bool): Whether to tag existing files.
-        overwriteSave (bool): Whether to overwrite the save file if it already exists.
-        changeableTags (List[str]): A list of tags that can be changed.
-        clearCovers (bool): Whether to clear the existing cover images already embedded.
-        coverDir (str): The directory where cover images will be saved.
-        coverQuality (int): The quality of the cover image.
+        saveData (JSONSaveStore | SQLiteSaveStore): The existing save data, which saved entries are added to.
+        options (Dict[str, Any]): The options from validateAndPrepareArgsURL, named like ytafURL's arguments (downloading, tagging, saving,
+            replacingFiles, tagExisting, overwriteSave, changeableTags, coverQuality, verboseSkipList, matchBitrate, metadataCache, checkpoint
+            and archive are the ones used here), along with the services ytafURL shares between entries:
+            prefetcher (ThumbnailPrefetcher | None): Downloads the thumbnail in the background while the audio is being converted.
+            outputIndex (OutputDirIndex): The audio files already in the output directory by video ID, to check instead of the file system.
+            transcodeReport (TranscodeReport): Where the conversion time and bytes saved by matching the bitrate are added up.
+            syncedIDs (set): Where the video ID is added once the entry needs nothing more, for the playlist snapshots of incrementalSync.
+            coverOptions (Dict[str, Any]): The cover options passed to addTags.
         skipList (List[Tuple[str, str]]): A list of tuples where the first element is a YouTube URL and the second element is the reason why it was skipped.
-        verboseSkipList (bool): Whether to print all operations that were skipped or just downloads.
     """
+    job = planEntryURL(entry, ydlOpts, saveData, options, skipList)
+    if job is None: return
+    if not fetchEntryURL(job, ydlOpts, skipList, options["metadataCache"], options["prefetcher"]): return
+    if not transcodeEntryURL(job, ydlOpts, skipList, options["matchBitrate"], options["transcodeReport"]): return
+    finishEntryURL(job, saveData, options["changeableTags"], options["coverOptions"], skipList, options["verboseSkipList"])
+
+def planEntryURL(entry: Dict[str, Any], ydlOpts: Dict[str, Any], saveData: Union["JSONSaveStore", "SQLiteSaveStore"], options: Dict[str, Any],
+                 skipList: List[Tuple[str, str]]) -> Union[Dict[str, Any], None]:
+    """
+    Works out which operations an entry needs. The returned job is what gets passed through the rest of the processing steps.
+    Arguments are the same as processEntryURL.
+    
+    Returns:
+        Union[Dict[str, Any], None]: The job for the entry or None if the video is unavailable or was finished by an interrupted run.
+    """
+    downloading, tagging, saving = options["downloading"], options["tagging"], options["saving"]
+    replacingFiles, tagExisting, overwriteSave = options["replacingFiles"], options["tagExisting"], options["overwriteSave"]
+    changeableTags, coverQuality = options["changeableTags"], options["coverQuality"]
+    checkpoint, outputIndex, archive, syncedIDs = options["checkpoint"], options["outputIndex"], options["archive"], options["syncedIDs"]
+
+    finishedOps = checkpoint.finishedOps(entry.get("id")) if checkpoint else set()
+    if "done" in finishedOps:
+        print(Fore.YELLOW + "Skipping ~ already finished before the last run of this playlist was interrupted")
+        if syncedIDs is not None: syncedIDs.add(entry.get("id"))
+        return None
 
     if entry.get("duration") is None: # Skip if video is unavailable
         print(Fore.RED + "Skipping unavailable video: " + entry["url"])
-        with yt_dlp.YoutubeDL(ydlOpts) as ydl:
-            try: ydl.extract_info(entry["url"], download=False)
-            except yt_dlp.utils.DownloadError as e: addToSkipList(skipList, entry["url"], e)
-        return
+        ydl = YDL_POOL.get(ydlOpts)
+        waitForRateLimit("metadata")
+        try: ydl.extract_info(entry["url"], download=False)
+        except yt_dlp.utils.DownloadError as e: addToSkipList(skipList, entry["url"], e)
+        if syncedIDs is not None: syncedIDs.add(entry.get("id")) # only retried once its duration shows it's available again
+        return None
 
-    audioFilePath = sanitizeFileName( getActualFileName(entry, ydlOpts) )
-    audioFileExists = os.path.exists(audioFilePath)
+    audioExts = getOutputExts(ydlOpts) # native audio can end up with any of these, so a file with any of them counts as downloaded
+    audioFilePath = sanitizeFileName( getActualFileName(entry, ydlOpts, audioExts[0]) )
+    indexedFilePath = outputIndex.find(entry.get("id")) if outputIndex else None
+    if indexedFilePath: audioFilePath, audioFileExists = indexedFilePath, True # keeps using a file whose title changed since it was downloaded
+    elif outputIndex and outputIndex.covers(entry.get("id")): audioFileExists = False
+    else:
+        existingFilePath = next((filePath for filePath in (changeFileExt(audioFilePath, ext) for ext in audioExts) if os.path.exists(filePath)), None)
+        audioFileExists = existingFilePath is not None
+        if audioFileExists: audioFilePath = existingFilePath
+    if archive and audioFileExists: archive.record(entry.get("id"), audioFilePath) # so files from before the archive existed can be linked too
     audioSaveExists = audioFilePath in saveData
-    shouldDownload = downloading and (replacingFiles or not audioFileExists)
-    shouldTag = tagging and changeableTags and ((tagExisting and audioFileExists) or shouldDownload)
-    shouldSave = saving and changeableTags and (overwriteSave or not audioSaveExists)
+    if not (audioFileExists or audioSaveExists):
+        savedFilePath = saveData.pathForVideoID(entry.get("id"), os.path.dirname(audioFilePath))
+        if savedFilePath: audioFilePath, audioSaveExists = savedFilePath, True # keeps using the save entry of a video whose title changed since it was saved
+    shouldDownload = downloading and "download" not in finishedOps and (replacingFiles or not audioFileExists)
+    downloadedBefore = "download" in finishedOps and audioFileExists # downloaded by the interrupted run so it's still new
+    shouldTag = tagging and "tag" not in finishedOps and changeableTags and ((tagExisting and audioFileExists) or shouldDownload or downloadedBefore)
+    shouldSave = saving and "save" not in finishedOps and changeableTags and (overwriteSave or not audioSaveExists)
     shouldExtractVerbose = ((shouldTag or shouldSave) and (("thumbnail" in changeableTags and coverQuality >= 4) or "description" in changeableTags))
     # the basic info already has low quality thumbnails, so we don't need to extract verbose info when the cover quality requested is very low
+    shouldTagCover = shouldTag and "thumbnail" in changeableTags
+
+    return {
+        "entry": entry, "audioFilePath": audioFilePath, "audioFileExists": audioFileExists, "audioSaveExists": audioSaveExists,
+        "downloading": downloading, "tagging": tagging, "saving": saving, "replacingFiles": replacingFiles,
+        "tagExisting": tagExisting, "overwriteSave": overwriteSave,
+        "shouldDownload": shouldDownload, "shouldTag": shouldTag, "shouldSave": shouldSave, "shouldExtractVerbose": shouldExtractVerbose,
+        "shouldTagCover": shouldTagCover, "checkpoint": checkpoint, "outputIndex": outputIndex, "archive": archive, "audioExts": audioExts,
+        "syncedIDs": syncedIDs
+    }
+
+def fetchEntryURL(job: Dict[str, Any], ydlOpts: Dict[str, Any], skipList: List[Tuple[str, str]], metadataCache: "MetadataCache" = None,
+                  prefetcher: "ThumbnailPrefetcher" = None) -> bool:
+    """
+    Downloads the audio and/or extracts the verbose info of a job from planEntryURL, if it needs either.
+    Downloads are left in their original format for transcodeEntryURL to convert.
+    
+    Args:
+        job (Dict[str, Any]): The job from planEntryURL.
+        ydlOpts (Dict[str, Any]): A dictionary of options for the yt-dlp YoutubeDL object. Its postprocessors are left for transcodeEntryURL.
+        skipList (List[Tuple[str, str]]): A list of tuples where the first element is a YouTube URL and the second element is the reason why it was skipped.
+        metadataCache (MetadataCache, optional): The cache of verbose video info to check before extracting. Defaults to None.
+        prefetcher (ThumbnailPrefetcher, optional): Starts downloading the thumbnail as soon as it's known. Defaults to None.
+    
+    Returns:
+        bool: Whether the entry can continue to be processed.
+    """
+    entry, shouldDownload = job["entry"], job["shouldDownload"]
+    if shouldDownload and not job["replacingFiles"] and linkArchivedAudio(job): shouldDownload = job["shouldDownload"] = False
+    if not (shouldDownload or job["shouldExtractVerbose"]): return True
+
+    # Without a download, the verbose extraction is only for the thumbnail and description which may already be cached
+    cachedInfo = metadataCache.get(entry["id"]) if metadataCache and not shouldDownload else None
+    if cachedInfo:
+        print(Fore.GREEN + f"Using cached info for ({entry['url']}):", entry["title"])
+        entry["thumbnail"] = cachedInfo["thumbnail"]
+        entry["description"] = cachedInfo["description"]
+        if prefetcher and job["shouldTagCover"]: prefetcher.prefetch(entry["thumbnail"])
+        return True
+
+    print(Fore.GREEN + f"{'Downloading' if shouldDownload else 'Extracting info for'} ({entry['url']}):", entry["title"])
+    ydl = YDL_POOL.get({key: value for key, value in ydlOpts.items() if key != "postprocessors"})
+    def extract() -> Dict[str, Any]:
+        waitForRateLimit("metadata")
+        if shouldDownload: waitForRateLimit("media")
+        return ydl.extract_info(entry["url"], download=shouldDownload)
+    try: verboseInfo = retryCall(extract, "downloading" if shouldDownload else "extracting")
+    except yt_dlp.utils.DownloadError as extractionError:
+        # age restricted videos still have a thumbnail, though not the full res one
+        if "confirm your age" in str(extractionError): entry["thumbnail"] = entry["thumbnails"][-1]["url"]
+        print(Fore.RED + f"Failed to {'download' if shouldDownload else 'extract information for'} {entry['url']}")
+        addToSkipList(skipList, entry["url"], extractionError)
+        return False
+    
+    if shouldDownload: job["rawInfo"] = verboseInfo["requested_downloads"][0]
+
+    # The original, full resolution thumbnail and the description can only be accessed through verbose extraction
+    # Even though there is an option in yt-dlp specifically for writing thumbnails and converting them to a jpgs
+    # It doesn't seem to work.
+    entry["thumbnail"] = verboseInfo["thumbnail"]
+    entry["description"] = verboseInfo["description"]
+    if metadataCache: metadataCache.put(entry["id"], {**entry, "uploader": verboseInfo.get("uploader", entry.get("uploader"))})
+    if prefetcher and job["shouldTagCover"]: prefetcher.prefetch(entry["thumbnail"]) # downloads while the audio gets converted
+    if shouldDownload: print(Fore.GREEN + job["rawInfo"]["filepath"] + " has been downloaded successfully")
+    return True
+
+def transcodeEntryURL(job: Dict[str, Any], ydlOpts: Dict[str, Any], skipList: List[Tuple[str, str]], matchBitrate: bool = False,
+                      transcodeReport: "TranscodeReport" = None) -> bool:
+    """
+    Converts the raw download left by fetchEntryURL with the same FFmpegExtractAudio options a normal download would use
+    and moves it to the job's audio file path, with the extension it was converted to. Jobs without a raw download are left as they are.
+    
+    Args:
+        job (Dict[str, Any]): The job from planEntryURL.
+        ydlOpts (Dict[str, Any]): A dictionary of options for the yt-dlp YoutubeDL object, including the FFmpegExtractAudio postprocessor.
+        skipList (List[Tuple[str, str]]): A list of tuples where the first element is a YouTube URL and the second element is the reason why it was skipped.
+        matchBitrate (bool, optional): Whether MP3s are encoded at the source's bitrate instead of the postprocessor's. Defaults to False.
+        transcodeReport (TranscodeReport, optional): Where the conversion time and bytes saved by matching the bitrate are added up. Defaults to None.
+    
+    Returns:
+        bool: Whether the entry can continue to be processed.
+    """
+    rawInfo = job.pop("rawInfo", None)
+    if rawInfo is None: return True
 
-    if shouldDownload or shouldExtractVerbose:
-        print(Fore.GREEN + f"{'Downloading' if shouldDownload else 'Extracting info for'} ({entry['url']}):", entry["title"])
-        with yt_dlp.YoutubeDL(ydlOpts) as ydl:
-            for i in range(RETRY_LIMIT):
-                try:
-                    verboseInfo = ydl.extract_info(entry["url"], download=shouldDownload)
-
-                    """
-                    For some reason, the verbose extraction doesn't always give the full title which messes up the filename
-                    As an example this video: https://www.youtube.com/watch?v=UnIhRpIT7nc
-                    The full title is "inabakumori - Lagtrain (Vo. Kaai Yuki) / 稲葉曇『ラグトレイン』Vo. 歌愛ユキ"
-                    The verbose extraction only gives: "稲葉曇『ラグトレイン』Vo. 歌愛ユキ" (verboseInfo["title" or "fulltitle"])
-                    This is doubly confusing because the concise extraction gives it perfect fine
-                    """
-                    os.rename(getActualFileName(verboseInfo, ydlOpts), audioFilePath)
-
-                    # The original, full resolution thumbnail and the description can only be accessed through verbose extraction
-                    # Even though there is an option in yt-dlp specifically for writing thumbnails and converting them to a jpgs
-                    # It doesn't seem to work.
-                    entry["thumbnail"] = verboseInfo["thumbnail"]
-                    entry["description"] = verboseInfo["description"]
-                    if shouldDownload: print(Fore.GREEN + audioFilePath + " has been downloaded successfully")
-                    break
-                except yt_dlp.utils.DownloadError as e:
-                    extractionError = e
-
-                    if i == 0:
-                        
-                        if not isConnectionError(extractionError): # if its not a connection error, don't retry
-                            # age restricted videos still have a thumbnail, thoughnot the full res one
-                            if "confirm your age" in str(extractionError): entry["thumbnail"] = entry["thumbnails"][-1]["url"]
-                            i = RETRY_LIMIT-1
-                            break
-                            
-                    else:
-                        print(Fore.RED + f"Error {'downloading' if shouldDownload else 'extracting'}: {extractionError}")
-                        if i < RETRY_LIMIT - 1: print(Fore.YELLOW + "Retrying...")
-            
-            if i == RETRY_LIMIT-1:
-                print(Fore.RED + f"Failed to {'download' if shouldDownload else 'extract information for'} {entry['url']}")
-                addToSkipList(skipList, entry["url"], extractionError)
-                return
+    try:
+        convertedFilePath = convertAudio(rawInfo, ydlOpts, matchBitrate, transcodeReport)
+
+        """
+        For some reason, the verbose extraction doesn't always give the full title which messes up the filename
+        As an example this video: https://www.youtube.com/watch?v=UnIhRpIT7nc
+        The full title is "inabakumori - Lagtrain (Vo. Kaai Yuki) / 稲葉曇『ラグトレイン』Vo. 歌愛ユキ"
+        The verbose extraction only gives: "稲葉曇『ラグトレイン』Vo. 歌愛ユキ" (verboseInfo["title" or "fulltitle"])
+        This is doubly confusing because the concise extraction gives it perfect fine
+        so the converted file is moved to the path made from the concise info
+        """
+        job["audioFilePath"] = changeFileExt(job["audioFilePath"], os.path.splitext(convertedFilePath)[1][1:]) # native audio only has its extension now
+        os.replace(convertedFilePath, job["audioFilePath"])
+        job["audioFileExists"] = True
+        if job["outputIndex"]: job["outputIndex"].add(job["entry"].get("id"), job["audioFilePath"])
+        if job["archive"]: job["archive"].record(job["entry"].get("id"), job["audioFilePath"])
+        if job["checkpoint"]: job["checkpoint"].record(job["entry"].get("id"), "download")
+    except yt_dlp.utils.PostProcessingError as e:
+        print(Fore.RED + f"Failed to convert {job['entry']['url']}: {e}")
+        addToSkipList(skipList, job["entry"]["url"], f"Conversion error ~ {e}")
+        return False
+    
+    print(Fore.GREEN + job["audioFilePath"] + " has been converted successfully")
+    return True
 
-    audioFileExists = os.path.exists(audioFilePath)
-    shouldTag = shouldTag and audioFileExists
+def convertAudio(rawInfo: Dict[str, Any], ydlOpts: Dict[str, Any], matchBitrate: bool = False, transcodeReport: "TranscodeReport" = None) -> str:
+    """
+    Converts a raw download with the FFmpegExtractAudio postprocessor in ydlOpts and deletes the raw file.
+    With matchBitrate, MP3s are encoded at the lowest bitrate that's at least the source's (abr) instead of always the postprocessor's,
+    since encoding a 130 kbps source at 320 kbps only makes the file bigger and slower to write without sounding any better.
+    
+    Args:
+        rawInfo (Dict[str, Any]): The info of the raw download, from requested_downloads.
+        ydlOpts (Dict[str, Any]): A dictionary of options for the yt-dlp YoutubeDL object, including the FFmpegExtractAudio postprocessor.
+        matchBitrate (bool, optional): Whether MP3s are encoded at the source's bitrate. Defaults to False.
+        transcodeReport (TranscodeReport, optional): Where the conversion time and bytes saved are added up. Defaults to None.
+    
+    Returns:
+        str: The path of the converted file.
+    
+    Raises:
+        yt_dlp.utils.PostProcessingError: If the audio couldn't be converted.
+    """
+    ppOpts = next(pp for pp in ydlOpts["postprocessors"] if pp["key"] == "FFmpegExtractAudio").copy()
+    del ppOpts["key"]
+    bytesSaved = 0
+    maxBitrate = int(ppOpts.get("preferredquality") or 0)
+    if matchBitrate and ppOpts["preferredcodec"] == "mp3" and maxBitrate > 10: # 10 and under are VBR qualities, not bitrates
+        bitrate = matchedMP3Bitrate(rawInfo.get("abr"), maxBitrate)
+        ppOpts["preferredquality"] = str(bitrate)
+        bytesSaved = (maxBitrate-bitrate) * 1000//8 * int(rawInfo.get("duration") or 0)
+        print(Fore.GREEN + f"Encoding at {bitrate} kbps for the {rawInfo.get('abr') or 'unknown'} kbps source, about {bytesSaved/1024/1024:.1f} MiB less than {maxBitrate} kbps")
+
+    print(Fore.GREEN + "Converting:", rawInfo["filepath"])
+    ydl = YDL_POOL.get(ydlOpts)
+    startTime = time.monotonic()
+    filesToDelete, rawInfo = FFmpegExtractAudioPP(ydl, **ppOpts).run(rawInfo)
+    for filePath in filesToDelete: os.remove(filePath)
+    if transcodeReport: transcodeReport.add(time.monotonic()-startTime, bytesSaved)
+    return rawInfo["filepath"]
+
+def matchedMP3Bitrate(sourceBitrate: Union[float, None], maxBitrate: int = 320) -> int:
+    """The lowest MP3 bitrate that's at least the source's, so nothing is lost in the conversion, up to maxBitrate. Unknown sources get maxBitrate."""
+    if not sourceBitrate: return maxBitrate
+    return min(next((bitrate for bitrate in MP3_BITRATES if bitrate >= sourceBitrate), maxBitrate), maxBitrate)
+
+def finishEntryURL(job: Dict[str, Any], saveData: Union["JSONSaveStore", "SQLiteSaveStore"], changeableTags: List[str], coverOptions: Dict[str, Any],
+                   skipList: List[Tuple[str, str]], verboseSkipList: bool) -> None:
+    """
+    Tags and saves a job from planEntryURL once its audio/verbose info is available, then reports what was skipped.
+    
+    Args:
+        job (Dict[str, Any]): The job from planEntryURL, with the audio file transcodeEntryURL left.
+        saveData (JSONSaveStore | SQLiteSaveStore): The existing save data, which saved entries are added to.
+        changeableTags (List[str]): A list of tags that can be changed.
+        coverOptions (Dict[str, Any]): The cover options passed to addTags.
+        skipList (List[Tuple[str, str]]): A list of tuples where the first element is a YouTube URL and the second element is the reason why it was skipped.
+        verboseSkipList (bool): Whether to print all operations that were skipped or just downloads.
+    """
+    entry, audioFilePath, audioSaveExists = job["entry"], job["audioFilePath"], job["audioSaveExists"]
+    downloading, tagging, saving = job["downloading"], job["tagging"], job["saving"]
+    replacingFiles, tagExisting, overwriteSave = job["replacingFiles"], job["tagExisting"], job["overwriteSave"]
+    shouldDownload, shouldSave, checkpoint = job["shouldDownload"], job["shouldSave"], job["checkpoint"]
+
+    audioFileExists = job["audioFileExists"] # kept up to date by transcodeEntryURL
+    shouldTag = job["shouldTag"] and audioFileExists
+    finished = audioFileExists or not (downloading or tagging) # whether every operation the entry needed worked, so it doesn't have to be tried again
     
     if shouldTag or shouldSave:
         print(Fore.GREEN + "Parsing entry data...")
-        entry["coverQuality"] = coverQuality
+        entry["coverQuality"] = coverOptions.get("coverQuality", 75)
         metadata = parseEntryData(entry, changeableTags)
 
         if shouldTag:
             print(Fore.GREEN + "Adding tags to:", audioFilePath)
-            coverOptions = {"clearCovers": clearCovers, "coverDir": coverDir, "coverQuality": coverQuality}
-            result, wasTagged = addID3Tags(audioFilePath, metadata, coverOptions)
+            result, wasTagged = addTags(audioFilePath, metadata, coverOptions)
             if verboseSkipList and not wasTagged: addToSkipList(skipList, entry["url"], result)
+            if not (wasTagged or result == TAGS_UP_TO_DATE): finished = False # failed or skipped tags are retried when the run is resumed
+            elif checkpoint: checkpoint.record(entry.get("id"), "tag")
         
         if shouldSave:
             print(Fore.GREEN + ("Overwriting save" if audioSaveExists else "Saving initial") + " data...")
             for key, value in metadata.items(): print( key.capitalize()+": "+value )
             
-            if audioFilePath in saveData:
-                if overwriteSave: saveData[audioFilePath].update(metadata)
-            else: saveData[audioFilePath] = metadata
+            saveData.upsert(audioFilePath, metadata, overwriteSave, entry.get("id"))
+            if checkpoint: checkpoint.record(entry.get("id"), "save")
         
     # Skip message handling
     
     skipMessages = ([], []) # first for console message and second for skip list
 
-    if downloading and not shouldDownload and not replacingFiles and audioFileExists:
+    if downloading and not shouldDownload and not replacingFiles and audioFileExists and not job.get("linkedFrom"):
         skipMessages[0].append("Downloading skipped ~ "+audioFilePath+" already exists")
         if verboseSkipList: skipMessages[1].append("Skipped Downloading (Audio file already exists)")
     
@@ -337,10 +778,61 @@ def processEntryURL(entry: Dict[str, Any], ydlOpts: Dict[str, Any], saveData: Di
     if skipMessages[0]:
         print(Fore.YELLOW + "\n".join(skipMessages[0]))
         if verboseSkipList: addToSkipList(skipList, entry["url"], " | ".join(skipMessages[1]))
+    
+    if checkpoint and finished: checkpoint.record(entry.get("id"), "done")
+    if finished and job["syncedIDs"] is not None: job["syncedIDs"].add(entry.get("id"))
+
+def linkArchivedAudio(job: Dict[str, Any]) -> bool:
+    """
+    Hard links the job's audio file to the copy of the same video in the archive, or copies it if the file system can't link it.
+    
+    Returns:
+        bool: Whether the audio file was linked or copied, False if it still has to be downloaded.
+    """
+    entry = job["entry"]
+    archivedFilePath = job["archive"].find(entry.get("id")) if job["archive"] else None
+    if not archivedFilePath: return False
+    archivedExt = os.path.splitext(archivedFilePath)[1][1:]
+    if archivedExt not in job["audioExts"]: return False # e.g. an MP3 can't stand in for native audio
+    audioFilePath = changeFileExt(job["audioFilePath"], archivedExt)
+    if os.path.normcase(os.path.abspath(archivedFilePath)) == os.path.normcase(os.path.abspath(audioFilePath)): return False
+
+    try:
+        try: os.link(archivedFilePath, audioFilePath)
+        except OSError: shutil.copy2(archivedFilePath, audioFilePath) # different drives or a file system without hard links
+    except OSError as e:
+        print(Fore.YELLOW + f"Couldn't link {archivedFilePath}, downloading instead:", e)
+        return False
+    
+    print(Fore.GREEN + f"Linked {audioFilePath} to the already downloaded {archivedFilePath}")
+    job["linkedFrom"] = archivedFilePath
+    job["audioFilePath"], job["audioFileExists"] = audioFilePath, True
+    if job["outputIndex"]: job["outputIndex"].add(entry.get("id"), audioFilePath)
+    if job["checkpoint"]: job["checkpoint"].record(entry.get("id"), "download")
+    return True
+
+def getActualFileName(infoDict: Dict[str, Any], ydlOpts: Dict[str, Any], ext: str = "mp3") -> str:
+    """
+    Returns the actual file name of a video from its info dictionary.
+    Fills in the output template the same way yt-dlp's prepare_filename does by default, without having to build a YoutubeDL for it.
+    """
+    outtmpl = ydlOpts["outtmpl"]
+    if isinstance(outtmpl, dict): outtmpl = outtmpl["default"] # YoutubeDL normalizes the options it's given in place
+    # ~ and env vars are expanded before the fields are filled in and a lone % (e.g. in the output directory) is escaped, both like yt-dlp does
+    outtmpl = yt_dlp.YoutubeDL.escape_outtmpl(yt_dlp.YoutubeDL._outtmpl_expandpath(outtmpl))
+    
+    class TemplateFields(dict): # every template field gets sanitized, missing ones become "NA" like in yt-dlp
+        def __missing__(self, key: str) -> str:
+            value = infoDict.get(key)
+            return "NA" if value is None or value == "" else yt_dlp.utils.sanitize_filename(str(value))
+    
+    fileName = yt_dlp.utils.sanitize_path(outtmpl % TemplateFields(ext=ext))
+    return os.path.normpath(fileName)
 
-def getActualFileName(infoDict: Dict[str, Any], ydlOpts: Dict[str, Any]) -> str:
-    """Returns the actual file name of a video from its info dictionary."""
-    return os.path.normpath( changeFileExt( yt_dlp.YoutubeDL(ydlOpts).prepare_filename(infoDict), "mp3" ) )
+def getOutputExts(ydlOpts: Dict[str, Any]) -> Tuple[str, ...]:
+    """Returns the extensions audio converted with the options' FFmpegExtractAudio postprocessor can have, the most likely one first."""
+    codec = next(pp for pp in ydlOpts["postprocessors"] if pp["key"] == "FFmpegExtractAudio")["preferredcodec"]
+    return NATIVE_AUDIO_EXTS if codec == "best" else (AUDIO_CODEC_EXTS[codec],)
 
 def sanitizeFileName(filepath: str) -> str:
     base, ext = os.path.splitext(os.path.basename(filepath))
@@ -388,7 +880,7 @@ def ytafJSON(arguments: Dict[str, Any]) -> List[Tuple[str, str]]:
     """
     Args:
         arguments (Dict): A dictionary containing the following keys:
-            saveFilePath (str): The path to the save file to be extracted from
+            saveFilePath (str): The path to the save file to be extracted from, either JSON or an SQLite database (.db, .sqlite or .sqlite3).
             downloading (bool, optional): Whether to download the audio files. Defaults to True.
             tagging (bool, optional): Whether to tag the audio files. Defaults to True.
             replacingFiles (bool, optional): Whether to replace the audio if it already exists. Defaults to False.
@@ -398,6 +890,14 @@ def ytafJSON(arguments: Dict[str, Any]) -> List[Tuple[str, str]]:
             coverDir (str, optional): The directory where cover images will be saved. None or "" to not save covers.
             coverQuality (int, optional): The quality of the cover image. Defaults to 75. Values above 95 result in higher file sizes with a diminishing return on quality.
             verboseSkipList (bool, optional): Whether to print all operations that were skipped or just downloads. Defaults to False.
+            coverCacheDir (str, optional): The directory where downloaded and compressed thumbnails are cached so they can be reused. Defaults to ~/.ytAudioFetchCache/covers. None or "" to not use a cache.
+            coverCacheSize (int, optional): The maximum size of the cover cache in bytes, least recently used covers are removed first. Defaults to 256 MiB.
+            prefetchDepth (int, optional): How many of the upcoming entries' thumbnails can be downloaded in the background. Defaults to 4. 0 to not prefetch.
+            tagWorkers (int, optional): The number of processes that tag entries at the same time when only tagging. Defaults to 1 which tags in this process.
+            tagPadding (int, optional): The bytes of padding added when a tag doesn't fit in the file's existing padding, so later retags can be written in place. Defaults to 64 KiB.
+            matchBitrate (bool, optional): Whether MP3s are encoded at the lowest bitrate that's at least the source audio's instead of always 320 kbps. Defaults to True.
+            downloadTuning (Dict[str, Any], optional): Overrides for any of the DOWNLOAD_TUNING keys: fragments, chunkSize and socketTimeout.
+            rateLimits (Dict[str, Dict[str, float]], optional): Overrides for the "metadata", "media" and "thumbnail" request budgets in RATE_LIMITS, each a {"rate": requests per second, "burst": requests} or None for no limit.
     Returns:
         List[Tuple[str, str]]: A list of tuples containing the audio file path and the reason it was skipped.
     """
@@ -406,12 +906,16 @@ def ytafJSON(arguments: Dict[str, Any]) -> List[Tuple[str, str]]:
     if params is None: return []
     ( saveFilePath, downloading, tagging, replacingFiles,
       proxyURL, changeableTags, clearCovers, coverDir,
-      coverQuality, verboseSkipList ) = params
+      coverQuality, verboseSkipList, coverCache, prefetchDepth, tagWorkers, tagPadding, matchBitrate,
+      downloadTuning, rateLimits ) = params
+    setRateLimits(rateLimits)
+    CIRCUIT_BREAKER.reset()
 
     skipList = []
 
-    # Load save data
-    errorType, saveData = loadSaveData(saveFilePath)
+    # Load save data, JSON save files are read an entry at a time so processing can start before the whole file is parsed
+    if saveFilePath.lower().endswith(SQLITE_SAVE_EXTS): errorType, saveData = loadSaveStore(saveFilePath, create=False)
+    else: errorType, saveData = streamSaveData(saveFilePath)
 
     if errorType != -1:
 
@@ -424,27 +928,88 @@ def ytafJSON(arguments: Dict[str, Any]) -> List[Tuple[str, str]]:
         
         return skipList
 
-    entries = len(saveData)
+    entries = len(saveData) if isinstance(saveData, SQLiteSaveStore) else None # counting a streamed file would mean reading all of it first
+    saveItems = saveData.items() if isinstance(saveData, SQLiteSaveStore) else saveData
 
     # Setup ydl options for verbose download/tagging operations
     ydlVerbose = YDL_VERBOSE_EXTRACTION_OPTS.copy()
     if proxyURL: ydlVerbose["proxy"] = proxyURL
+    applyDownloadTuning(ydlVerbose, downloadTuning)
+    transcodeReport = TranscodeReport()
+
+    # Only tagging is all local work that's mostly parsing, compressing and writing, so it's spread over processes to use every core
+    tagPool = None
+    if tagWorkers > 1 and tagging and not downloading:
+        workerOptions = {
+            "ydlOpts": ydlVerbose, "downloading": False, "tagging": True, "replacingFiles": replacingFiles, "changeableTags": changeableTags,
+            "clearCovers": clearCovers, "coverDir": coverDir, "coverQuality": coverQuality, "verboseSkipList": verboseSkipList, "coverCache": coverCache,
+            "tagPadding": tagPadding
+        }
+        # spawned rather than forked since this may be running next to other threads, like the GUI's
+        # each worker gets an even share of the rate limits so together they stay within them
+        tagPool = ProcessPoolExecutor(tagWorkers, mp_context=multiprocessing.get_context("spawn"), initializer=initTagWorker, initargs=(workerOptions, rateLimits, tagWorkers))
+        prefetchDepth = 0 # the workers download their own thumbnails
+    pendingTags = deque() # entries being tagged by the workers, in order
     
-    print()
-    for i, (audioFilePath, data) in enumerate(saveData.items(), start=1):
-        print(Fore.BLUE+f"JSON entry {i} of {entries}", "-", audioFilePath)
+    def printEntry(i: int, audioFilePath: str, data: Dict[str, str]) -> None:
+        print(Fore.BLUE+f"JSON entry {i}" + (f" of {entries}" if entries is not None else ""), "-", audioFilePath)
         print(*[ f"{key}: {value}" for key, value in data.items()], sep="\n")
+    def reportTagged() -> None: # the oldest entry's output is printed once its worker is done so entries don't get mixed together
+        i, audioFilePath, data, future = pendingTags.popleft()
+        output, entrySkipList = future.result()
+        printEntry(i, audioFilePath, data)
+        print(output, end="")
+        skipList.extend(entrySkipList)
+        print("\n")
+
+    # Thumbnails of the next few entries that will be tagged get downloaded in the background while the current one is processed
+    prefetcher = ThumbnailPrefetcher(prefetchDepth, coverCache, coverQuality) if prefetchDepth and tagging and "thumbnail" in changeableTags else None
+    upcoming = deque() # the current entry followed by the ones being prefetched
+    readError = None # a streamed file can turn out to be invalid part way through, the entries before that still get processed
+    def readUpcoming() -> None:
+        nonlocal readError
+        while len(upcoming) <= prefetchDepth and readError is None:
+            try: upcomingItem = next(saveItems, None)
+            except ValueError as e: readError = e
+            if readError is not None or upcomingItem is None: return
+            upcoming.append(upcomingItem)
+            upcomingPath, upcomingData = upcomingItem
+            if prefetcher and (downloading or os.path.exists(upcomingPath)): prefetcher.prefetch((upcomingData.get("thumbnail") or "").strip())
+    
+    print()
+    i = 0
+    while True:
+        readUpcoming()
+        if not upcoming: break
+        audioFilePath, data = upcoming.popleft()
+        i += 1
+        if tagPool:
+            pendingTags.append((i, audioFilePath, data, tagPool.submit(tagEntryJSONInWorker, audioFilePath, data)))
+            if len(pendingTags) >= 2*tagWorkers: reportTagged() # keeps the workers busy without reading ahead the whole file
+            continue
+        printEntry(i, audioFilePath, data)
         processEntryJSON(
             audioFilePath, data, ydlVerbose, downloading, tagging,
             replacingFiles, changeableTags, clearCovers, coverDir,
-            coverQuality, skipList, verboseSkipList
+            coverQuality, skipList, verboseSkipList, coverCache, prefetcher, tagPadding, matchBitrate, transcodeReport
         )
         print("\n")
-    else: print(Fore.BLUE + "Processing of all entries complete")
+    while pendingTags: reportTagged()
+    if tagPool:
+        tagPool.shutdown()
+        if coverCache: coverCache.trim() # the workers' images are only counted once they're all done
     
+    if readError is None: print(Fore.BLUE + "Processing of all entries complete")
+    else:
+        print(Fore.YELLOW + "Badly formatted or invalid save file, stopping extraction:", readError)
+        addToSkipList(skipList, saveFilePath, f"Badly formatted or invalid save file after entry {i}")
+    transcodeReport.report()
+    if isinstance(saveData, SQLiteSaveStore): saveData.close()
+    if prefetcher: prefetcher.close()
+    YDL_POOL.close()
     return skipList
 
-def validateAndPrepareArgsJSON(arguments: Dict) -> Tuple[str, bool, bool, bool, List[str], bool, str, int, bool]:
+def validateAndPrepareArgsJSON(arguments: Dict) -> Tuple[str, bool, bool, bool, str, List[str], bool, str, int, bool, "CoverCache", int, int, int, bool, Dict[str, Any], Dict[str, Dict[str, float]]]:
     """Validates and prepares the input arguments for the ytafJSON function."""
     saveFilePath = arguments.get("saveFilePath")
     if not saveFilePath: raise ValueError("saveFilePath is required is argument dictionary")
@@ -463,6 +1028,9 @@ def validateAndPrepareArgsJSON(arguments: Dict) -> Tuple[str, bool, bool, bool,
     # download specific
     replacingFiles = arguments.get("replacingFiles", False)
     proxyURL = arguments.get("proxyURL", "")
+    matchBitrate = arguments.get("matchBitrate", True)
+    downloadTuning = validateDownloadTuning(arguments)
+    rateLimits = validateRateLimits(arguments)
 
     # cover options
     clearCovers = arguments.get("clearCovers", False)
@@ -470,6 +1038,11 @@ def validateAndPrepareArgsJSON(arguments: Dict) -> Tuple[str, bool, bool, bool,
     coverQuality = arguments.get("coverQuality", 75)
 
     verboseSkipList = arguments.get("verboseSkipList", False)
+    coverCache = prepareCoverCache(arguments)
+    prefetchDepth = validatePrefetchDepth(arguments)
+    tagWorkers = arguments.get("tagWorkers", 1)
+    if not isinstance(tagWorkers, int) or tagWorkers < 1: raise ValueError("tagWorkers must be a positive integer")
+    tagPadding = validateTagPadding(arguments)
 
     # Normalize paths
     saveFilePath = os.path.expanduser(saveFilePath)
@@ -478,11 +1051,59 @@ def validateAndPrepareArgsJSON(arguments: Dict) -> Tuple[str, bool, bool, bool,
     
     return saveFilePath, downloading, tagging, replacingFiles, \
            proxyURL, changeableTags, clearCovers, coverDir, \
-           coverQuality, verboseSkipList
+           coverQuality, verboseSkipList, coverCache, prefetchDepth, tagWorkers, tagPadding, matchBitrate, \
+           downloadTuning, rateLimits
+
+def prepareCoverCache(arguments: Dict) -> Union["CoverCache", None]:
+    """Creates the cover cache from the coverCacheDir and coverCacheSize arguments shared by both modes."""
+    coverCacheDir = arguments.get("coverCacheDir", os.path.join(CACHE_DIR, "covers"))
+    coverCacheSize = arguments.get("coverCacheSize", 256*1024*1024)
+    if coverCacheSize < 1: raise ValueError("coverCacheSize must be positive")
+    return CoverCache(os.path.expanduser(coverCacheDir), coverCacheSize) if coverCacheDir else None
+
+def validatePrefetchDepth(arguments: Dict) -> int:
+    """Validates the prefetchDepth argument shared by both modes."""
+    prefetchDepth = arguments.get("prefetchDepth", 4)
+    if not isinstance(prefetchDepth, int) or prefetchDepth < 0: raise ValueError("prefetchDepth must be a non-negative integer")
+    return prefetchDepth
+
+def validateDownloadTuning(arguments: Dict) -> Dict[str, Any]:
+    """Validates the downloadTuning argument shared by both modes and fills in the DOWNLOAD_TUNING defaults."""
+    downloadTuning = {**DOWNLOAD_TUNING, **arguments.get("downloadTuning", {})}
+    if set(downloadTuning) != set(DOWNLOAD_TUNING): raise ValueError("downloadTuning can only have the keys " + ", ".join(DOWNLOAD_TUNING))
+    if not isinstance(downloadTuning["fragments"], int) or downloadTuning["fragments"] < 1: raise ValueError("downloadTuning fragments must be a positive integer")
+    if not isinstance(downloadTuning["chunkSize"], int) or downloadTuning["chunkSize"] < 0: raise ValueError("downloadTuning chunkSize must be a non-negative integer")
+    if not isinstance(downloadTuning["socketTimeout"], (int, float)) or downloadTuning["socketTimeout"] <= 0: raise ValueError("downloadTuning socketTimeout must be positive")
+    return downloadTuning
+
+def applyDownloadTuning(ydlOpts: Dict[str, Any], downloadTuning: Dict[str, Any]) -> None:
+    """Sets the yt-dlp options for a validated downloadTuning."""
+    ydlOpts["concurrent_fragment_downloads"] = downloadTuning["fragments"]
+    ydlOpts["socket_timeout"] = downloadTuning["socketTimeout"]
+    if downloadTuning["chunkSize"]: ydlOpts["http_chunk_size"] = downloadTuning["chunkSize"]
+
+def validateRateLimits(arguments: Dict) -> Dict[str, Dict[str, float]]:
+    """Validates the rateLimits argument shared by both modes and fills in the RATE_LIMITS defaults."""
+    rateLimits = {**RATE_LIMITS, **arguments.get("rateLimits", {})}
+    if set(rateLimits) != set(RATE_LIMITS): raise ValueError("rateLimits can only have the keys " + ", ".join(RATE_LIMITS))
+    for kind, limit in rateLimits.items():
+        if limit is None: continue
+        if not isinstance(limit, dict) or set(limit) != {"rate", "burst"}: raise ValueError(f"rateLimits {kind} must be None or have the keys rate and burst")
+        if not isinstance(limit["rate"], (int, float)) or limit["rate"] <= 0: raise ValueError(f"rateLimits {kind} rate must be positive")
+        if not isinstance(limit["burst"], int) or limit["burst"] < 1: raise ValueError(f"rateLimits {kind} burst must be a positive integer")
+    return rateLimits
+
+def validateTagPadding(arguments: Dict) -> int:
+    """Validates the tagPadding argument shared by both modes."""
+    tagPadding = arguments.get("tagPadding", TAG_PADDING)
+    if not isinstance(tagPadding, int) or tagPadding < 0: raise ValueError("tagPadding must be a non-negative integer")
+    return tagPadding
 
 def processEntryJSON(audioFilePath: str, data: Dict[str, Dict[str, str]], ydlOpts: Dict[str, Any], downloading: bool,
                      tagging: bool, replacingFiles: bool, changeableTags: List[str], clearCovers: bool, coverDir: str,
-                     coverQuality: int, skipList: List[Tuple[str, str]], verboseSkipList: bool) -> None:
+                     coverQuality: int, skipList: List[Tuple[str, str]], verboseSkipList: bool, coverCache: "CoverCache" = None,
+                     prefetcher: "ThumbnailPrefetcher" = None, tagPadding: int = TAG_PADDING, matchBitrate: bool = False,
+                     transcodeReport: "TranscodeReport" = None) -> None:
     """
     Processes a single entry from a JSON file. More or less just processEntryURL but with no saving functionality
     since it's already extracting from a JSON file.
@@ -500,10 +1121,16 @@ def processEntryJSON(audioFilePath: str, data: Dict[str, Dict[str, str]], ydlOpt
         coverQuality (int): The quality of the cover image.
         skipList (List[Tuple[str, str]]): The list of skipped entries.
         verboseSkipList (bool): Whether to print all operations that were skipped or just downloads.
+        coverCache (CoverCache, optional): The cache of downloaded and compressed thumbnails. Defaults to None.
+        prefetcher (ThumbnailPrefetcher, optional): Where thumbnails downloaded ahead of time are taken from. Defaults to None.
+        tagPadding (int, optional): The bytes of padding added when the tag doesn't fit in the file's existing padding. Defaults to TAG_PADDING.
+        matchBitrate (bool, optional): Whether MP3s are encoded at the source's bitrate instead of the postprocessor's. Defaults to False.
+        transcodeReport (TranscodeReport, optional): Where the conversion time and bytes saved by matching the bitrate are added up. Defaults to None.
     """
-    if mimetypes.guess_type(audioFilePath)[0] != "audio/mpeg":
-        print(Fore.RED+"Warning!", audioFilePath, "is not an MP3, skipping...")
-        skipList.append((audioFilePath, "Not an MP3"))
+    audioExt = os.path.splitext(audioFilePath)[1][1:].lower()
+    if audioExt not in NATIVE_AUDIO_EXTS:
+        print(Fore.RED+"Warning!", audioFilePath, "is not an MP3, Opus, Ogg, M4A or FLAC file, skipping...")
+        skipList.append((audioFilePath, "Not a supported audio file"))
         return
 
     audioFileExists = os.path.exists(audioFilePath)
@@ -511,29 +1138,33 @@ def processEntryJSON(audioFilePath: str, data: Dict[str, Dict[str, str]], ydlOpt
 
     if shouldDownload:
         ydlOpts["outtmpl"] = changeFileExt(audioFilePath, "%(ext)s")
+        if audioExt != "mp3": # converted to whatever the save file's path expects, keeping the MP3 options otherwise
+            codec = next(codec for codec, ext in AUDIO_CODEC_EXTS.items() if ext == audioExt)
+            ydlOpts = {**ydlOpts, "postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": codec}]}
         url = data.get("url").strip()
         if url:
             print(Fore.GREEN + f"Downloading {data['url']} to {audioFilePath}")
-            with yt_dlp.YoutubeDL(ydlOpts) as ydl:
-                for i in range(RETRY_LIMIT):
-                    try:
-                        ydl.extract_info(data["url"], download=shouldDownload)
-                        audioFileExists = True
-                        break
-                    except yt_dlp.utils.DownloadError as e:
-                        extractionError = e
-                        # Check for non-connection errors on first try
-                        if i == 0 and not isConnectionError(extractionError):
-                            addToSkipList(skipList, data["url"], extractionError)
-                            skipList[-1] = (audioFilePath, f"({skipList[-1][0]}) {skipList[-1][1]}")
-                            break
-                        else:
-                            print(Fore.RED + f"Error {'downloading' if shouldDownload else 'extracting'}: {extractionError}")
-                            if i < RETRY_LIMIT - 1: print(Fore.YELLOW + "Retrying...")
-                else:
-                    print(Fore.RED + f"Failed to {'download' if shouldDownload else 'extract information for'} {data['url']}")
-                    addToSkipList(skipList, data["url"], extractionError)
-                    skipList[-1] = (audioFilePath, f"({skipList[-1][0]}) {skipList[-1][1]}")
+            ydl = YDL_POOL.get({key: value for key, value in ydlOpts.items() if key != "postprocessors"}) # converted after with convertAudio
+            rawInfo = None
+            def download() -> Dict[str, Any]:
+                waitForRateLimit("metadata")
+                waitForRateLimit("media")
+                return ydl.extract_info(data["url"], download=shouldDownload)["requested_downloads"][0]
+            try: rawInfo = retryCall(download, "downloading")
+            except yt_dlp.utils.DownloadError as extractionError:
+                retriesRanOut = classifyError(extractionError) != "permanent" # permanent errors still let an existing file get tagged
+                if retriesRanOut: print(Fore.RED + f"Failed to download {data['url']}")
+                addToSkipList(skipList, data["url"], extractionError)
+                skipList[-1] = (audioFilePath, f"({skipList[-1][0]}) {skipList[-1][1]}")
+                if retriesRanOut: return
+            
+            if rawInfo is not None:
+                try:
+                    convertedFilePath = convertAudio(rawInfo, ydlOpts, matchBitrate, transcodeReport)
+                    if convertedFilePath != audioFilePath: os.replace(convertedFilePath, audioFilePath)
+                except yt_dlp.utils.PostProcessingError as e:
+                    print(Fore.RED + f"Failed to convert {data['url']}: {e}")
+                    addToSkipList(skipList, audioFilePath, f"({data['url']}) Conversion error ~ {e}")
                     return
         else:
             print(Fore.YELLOW + "No URL found for this entry, skipping...")
@@ -545,8 +1176,8 @@ def processEntryJSON(audioFilePath: str, data: Dict[str, Dict[str, str]], ydlOpt
     if shouldTag:
         # for a tag to be in the metadata it has to be in changeableTags and in data
         metadata = { key: data.get(key) for key in changeableTags if data.get(key) and key in ID3_ALIASES }
-        coverOptions = { "clearCovers": clearCovers, "coverDir": coverDir, "coverQuality": coverQuality }
-        result, wasTagged = addID3Tags(audioFilePath, metadata, coverOptions)
+        coverOptions = { "clearCovers": clearCovers, "coverDir": coverDir, "coverQuality": coverQuality, "coverCache": coverCache, "prefetcher": prefetcher, "tagPadding": tagPadding }
+        result, wasTagged = addTags(audioFilePath, metadata, coverOptions)
         if verboseSkipList and not wasTagged: addToSkipList(skipList, audioFilePath, result)
 
     # Skip message handling
@@ -565,7 +1196,25 @@ def processEntryJSON(audioFilePath: str, data: Dict[str, Dict[str, str]], ydlOpt
         print(Fore.YELLOW + "\n".join(skipMessages[0]))
         if verboseSkipList: addToSkipList(skipList, audioFilePath, " | ".join(skipMessages[1]))
 
+TAG_WORKER_OPTIONS = {} # the processEntryJSON arguments shared by every entry, set once in each tag worker process
+
+def initTagWorker(workerOptions: Dict[str, Any], rateLimits: Dict[str, Dict[str, float]] = None, workers: int = 1) -> None:
+    TAG_WORKER_OPTIONS.update(workerOptions)
+    setRateLimits(rateLimits or {}, workers)
+
+def tagEntryJSONInWorker(audioFilePath: str, data: Dict[str, str]) -> Tuple[str, List[Tuple[str, str]]]:
+    """Runs processEntryJSON in a tag worker process and returns what it printed along with its skip list, for the main process to report."""
+    entrySkipList = []
+    with redirect_stdout(StringIO()) as output:
+        processEntryJSON(audioFilePath, data, skipList=entrySkipList, **TAG_WORKER_OPTIONS)
+    return output.getvalue(), entrySkipList
+
 # Tagging functions
+def addTags(audioFilePath: str, tagData: Dict[str, str] = None, coverOptions: Dict[str, Any] = None) -> Tuple[str, bool]:
+    """Tags an MP3 with addID3Tags and any other audio file with addNativeTags. Arguments and return value are the same as theirs."""
+    if os.path.splitext(audioFilePath)[1].lower() == ".mp3": return addID3Tags(audioFilePath, tagData, coverOptions)
+    return addNativeTags(audioFilePath, tagData, coverOptions)
+
 def addID3Tags(audioFilePath: str, tagData: Dict[str, str] = None, coverOptions: Dict[str, Any] = None) -> Tuple[str, bool]:
     """
     Adds ID3 tags to the audio file.
@@ -573,10 +1222,11 @@ def addID3Tags(audioFilePath: str, tagData: Dict[str, str] = None, coverOptions:
     Args:
         audioFilePath (str): The path to the audio file.
         tagData (Dict[str, str], optional): The data for the ID3 tags. Defaults to None.
-        coverOptions (Dict[str, Any], optional): The options for the cover image. Defaults to None.
+        coverOptions (Dict[str, Any], optional): The options for the cover image, along with the tagPadding to use. Defaults to None.
     
     Returns:
         Tuple[str, bool]: A tuple containing the message and a boolean indicating whether the operation was successful.
+        Files that were already tagged with the same data and cover options are left alone and count as skipped.
     """
     if not os.path.exists(audioFilePath):
         print(Fore.RED+"Warning!","Audio file does not exist:", audioFilePath)
@@ -591,11 +1241,16 @@ def addID3Tags(audioFilePath: str, tagData: Dict[str, str] = None, coverOptions:
     skippedTags = [] # list of skipped tags
 
     try:
+        fingerprint = tagFingerprint(data, coverOptions)
         try: tags = ID3(audioFilePath)
         except ID3NoHeaderError:
             print(Fore.YELLOW+ "No ID3 tag found, creating a new one...")
-            tags = ID3()
-            tags.save(audioFilePath)
+            tags = ID3() # only written once everything is added
+        
+        fingerprintFrame = tags.get("TXXX:"+TAG_FINGERPRINT_DESC)
+        if fingerprintFrame and fingerprintFrame.text == [fingerprint]:
+            print(Fore.GREEN+f"Tags of {audioFilePath} are already up to date, skipping...")
+            return (TAGS_UP_TO_DATE, False)
 
         coverSource = data.pop("thumbnail", None)
         url = data.pop("url", None)
@@ -618,7 +1273,71 @@ def addID3Tags(audioFilePath: str, tagData: Dict[str, str] = None, coverOptions:
         if coverSource is not None:
             addCoverToAudio(audioFilePath, coverSource.strip(), tags, skippedTags, coverOptions=coverOptions)
         
-        tags.save()
+        # Only fully tagged files get the fingerprint so anything that was skipped is tried again next time
+        tags.delall("TXXX:"+TAG_FINGERPRINT_DESC)
+        if not skippedTags: tags.add(TXXX(encoding=3, desc=TAG_FINGERPRINT_DESC, text=[fingerprint]))
+        tagPadding = coverOptions.get("tagPadding", TAG_PADDING)
+        # A tag that still fits in the file's padding is rewritten in place, otherwise the whole file has to be rewritten
+        # so it's given plenty of padding to make that the last time
+        tags.save(audioFilePath, padding=lambda info: info.padding if info.padding >= 0 else tagPadding)
+        print(Fore.GREEN+f"Tags added to {audioFilePath}")
+        return (f"Skipped tag(s) ( {' | '.join(skippedTags)} )", not bool(skippedTags))
+    
+    except Exception as e:
+        print(Fore.RED+f"Error adding tags to {audioFilePath}:", e)
+        return (f"Tagging error with {repr(audioFilePath)} ~ "+str(e), False)
+
+def addNativeTags(audioFilePath: str, tagData: Dict[str, str] = None, coverOptions: Dict[str, Any] = None) -> Tuple[str, bool]:
+    """
+    Adds tags to an Opus, Ogg Vorbis or FLAC file as Vorbis comments, or to an M4A file as MP4 atoms.
+    Arguments and return value are the same as addID3Tags.
+    """
+    if not os.path.exists(audioFilePath):
+        print(Fore.RED+"Warning!","Audio file does not exist:", audioFilePath)
+        print(Fore.YELLOW+"Skipping tagging...")
+        return (f"Skipping tagging. Audio file {repr(audioFilePath)} does not exist.", False)
+    
+    if not coverOptions: coverOptions = {}
+    data = tagData.copy() if tagData else {} # copy to avoid modifying original
+    skippedTags = []
+
+    try:
+        fingerprint = tagFingerprint(data, coverOptions)
+        audio = MutagenFile(audioFilePath)
+        if audio is None: raise ValueError("unsupported audio format")
+        if audio.tags is None:
+            print(Fore.YELLOW+ "No tags found, creating new ones...")
+            audio.add_tags()
+        aliases, fingerprintKey = (MP4_ALIASES, MP4_FINGERPRINT_KEY) if isinstance(audio, MP4) else (VORBIS_ALIASES, VORBIS_FINGERPRINT_KEY)
+        
+        if getNativeTag(audio.tags, fingerprintKey) == [fingerprint]:
+            print(Fore.GREEN+f"Tags of {audioFilePath} are already up to date, skipping...")
+            return (TAGS_UP_TO_DATE, False)
+
+        coverSource = data.pop("thumbnail", None)
+        url = data.pop("url", None)
+        for tag, value in data.items():
+            if tag in aliases:
+                tagText = value or f"[No {tag}]"
+                print(Fore.MAGENTA+f"Adding {tag} tag:", tagText)
+                try: setNativeTag(audio.tags, aliases[tag], tagText)
+                except Exception as e: addToSkippedTags(skippedTags,  f"There was an error adding the {tag} tag ({tagText}): {e}")
+            else: addToSkippedTags(skippedTags, f"Unknown tag: {tag}")
+
+        if url:
+            url = url.strip()
+            print(Fore.MAGENTA+"Adding URL:", url)
+            try: setNativeTag(audio.tags, aliases["url"], url)
+            except: addToSkippedTags(skippedTags, f"There was an error adding the URL tag. Value: {url}")
+
+        if coverSource is not None:
+            addCoverToNativeAudio(audioFilePath, coverSource.strip(), audio, skippedTags, coverOptions=coverOptions)
+        
+        # Only fully tagged files get the fingerprint so anything that was skipped is tried again next time
+        if fingerprintKey in audio.tags: del audio.tags[fingerprintKey]
+        if not skippedTags: setNativeTag(audio.tags, fingerprintKey, fingerprint)
+        tagPadding = coverOptions.get("tagPadding", TAG_PADDING)
+        audio.save(padding=lambda info: info.padding if info.padding >= 0 else tagPadding) # same as addID3Tags
         print(Fore.GREEN+f"Tags added to {audioFilePath}")
         return (f"Skipped tag(s) ( {' | '.join(skippedTags)} )", not bool(skippedTags))
     
@@ -626,6 +1345,25 @@ def addID3Tags(audioFilePath: str, tagData: Dict[str, str] = None, coverOptions:
         print(Fore.RED+f"Error adding tags to {audioFilePath}:", e)
         return (f"Tagging error with {repr(audioFilePath)} ~ "+str(e), False)
 
+def setNativeTag(tags, key: str, text: str) -> None:
+    """Sets a Vorbis comment or MP4 atom to a single value, freeform MP4 atoms only take bytes."""
+    tags[key] = [MP4FreeForm(text.encode())] if key.startswith("----") else [text]
+
+def getNativeTag(tags, key: str) -> List[str]:
+    """Returns the values of a Vorbis comment or MP4 atom as text."""
+    return [bytes(value).decode(errors="replace") if key.startswith("----") else str(value) for value in tags.get(key, [])]
+
+def tagFingerprint(tagData: Dict[str, str], coverOptions: Dict[str, Any]) -> str:
+    """A hash of everything that decides what addID3Tags and addNativeTags write, local cover images are included by their size and modification time."""
+    coverSource = (tagData.get("thumbnail") or "").strip()
+    coverFile = os.stat(coverSource) if coverSource and os.path.exists(coverSource) else None
+    fingerprintData = {
+        "tags": tagData,
+        "coverFile": [coverFile.st_size, coverFile.st_mtime_ns] if coverFile else None,
+        "coverOptions": {option: coverOptions.get(option) for option in ("clearCovers", "coverDir", "coverQuality")}
+    }
+    return sha256(json.dumps(fingerprintData, sort_keys=True).encode()).hexdigest()
+
 def addToSkippedTags(skippedTags: List[str], reason: str, alert: str = Fore.YELLOW+"Warning!") -> None:
     """prints tagging error and adds it to the skipped tags list."""
     print(alert, reason)
@@ -634,100 +1372,763 @@ def addToSkippedTags(skippedTags: List[str], reason: str, alert: str = Fore.YELL
 def addCoverToAudio(audioFilePath: str, coverSource: str, tags: ID3, skippedTags: List[str], coverOptions: Dict[str, Any] = None) -> Tuple[str, bool]:
     """Given a source for the cover image (file path or link), adds it to the audio file."""
     if coverOptions is None: coverOptions = {}
-
-    clearCovers = coverOptions.get("clearCovers", True)
     coverDir = coverOptions.get("coverDir")
-    coverQuality = coverOptions.get("coverQuality", 75)
-
-    # Download cover image if link, otherwise use local, otherwise use fallback 
-    wasDownloaded = False
-    if coverSource:
-        if os.path.exists(coverSource): coverFileName = coverSource
-        else: # coverSource is a link
-            try: coverFileName, wasDownloaded = downloadImage(coverSource), True
-            except exceptions.RequestException as e:
-                coverFileName = "NoCover.png"
-                addToSkippedTags(skippedTags, f"Failed to download thumbnail ({coverSource}): {e}", alert=Fore.RED+"Download error!")
-    else:
-        coverFileName = "NoCover.png"
-        addToSkippedTags(skippedTags, "No cover image source provided, falling back with NoCover.png") 
-
-    # Compress cover image and save them in cover directory if directory is provided
-    if coverDir:
-        # converts path/to/image.sdkms to path-to-image
-        jpgCoverFileName = os.path.splitext(audioFilePath)[0].replace(os.sep, '-')
-        jpgCoverPath = os.path.join(coverDir, jpgCoverFileName)+".jpg" # coverDir/path-to-image.jpg
-    else: jpgCoverPath = "YTAF-temp-cover.jpg"
-    jpgCompress(coverFileName, jpgCoverPath, coverQuality)
+    coverData, usedFallback = loadCoverImage(audioFilePath, coverSource, skippedTags, coverOptions)
 
     # Clear existing cover images if requested
-    if clearCovers:
-        if coverDir:
-            print(Fore.YELLOW+"Saving existing cover image(s) in cover directory before clearing them in tags...")
-            clearDir = os.path.join(coverDir, "clearedCovers"+jpgCoverFileName)
-            os.makedirs(clearDir, exist_ok=True)
-            saveTaggedCovers(tags, clearDir)
+    if coverOptions.get("clearCovers", True):
+        saveClearedCovers(audioFilePath, [(cover.mime, cover.data) for cover in tags.getall("APIC")], coverDir)
         print(Fore.YELLOW+"Removing existing cover image(s)...")
         tags.delall("APIC")
 
     # Add cover image to tags
-    print(Fore.MAGENTA+"Adding cover image:", jpgCoverPath)
+    print(Fore.MAGENTA+"Adding cover image:", coverFilePath(audioFilePath, coverDir) if coverDir else coverSource)
     try:
+        if coverData is None: raise ValueError("the cover image could not be converted")
         tags.add(APIC(
-            encoding=3, mime='image/jpeg', type=3, data=readImg(jpgCoverPath),
-            desc=f"Cover source: {coverSource}" if coverFileName != "NoCover.png" else "Couldn't find cover image"
+            encoding=3, mime='image/jpeg', type=3, data=coverData,
+            desc=f"Cover source: {coverSource}" if not usedFallback else "Couldn't find cover image"
         ))
     except Exception as e: addToSkippedTags(skippedTags, f"There was an error adding the cover image ({coverSource}): {e}")
+
+def addCoverToNativeAudio(audioFilePath: str, coverSource: str, audio, skippedTags: List[str], coverOptions: Dict[str, Any] = None) -> None:
+    """addCoverToAudio for the files addNativeTags tags, where covers are MP4 covr atoms, FLAC pictures or Vorbis METADATA_BLOCK_PICTUREs."""
+    if coverOptions is None: coverOptions = {}
+    coverDir = coverOptions.get("coverDir")
+    coverData, usedFallback = loadCoverImage(audioFilePath, coverSource, skippedTags, coverOptions)
+
+    if isinstance(audio, MP4): pictures = []
+    elif isinstance(audio, FLAC): pictures = audio.pictures
+    else:
+        pictures = []
+        for value in audio.tags.get("METADATA_BLOCK_PICTURE", []):
+            try: pictures.append(Picture(base64.b64decode(value)))
+            except Exception: continue # not every tagger writes these correctly
+    if isinstance(audio, MP4):
+        existingCovers = [("image/png" if cover.imageformat == MP4Cover.FORMAT_PNG else "image/jpeg", bytes(cover)) for cover in audio.tags.get("covr", [])]
+    else: existingCovers = [(picture.mime, picture.data) for picture in pictures]
+
+    clearCovers = coverOptions.get("clearCovers", True)
+    if clearCovers:
+        saveClearedCovers(audioFilePath, existingCovers, coverDir)
+        print(Fore.YELLOW+"Removing existing cover image(s)...")
+
+    print(Fore.MAGENTA+"Adding cover image:", coverFilePath(audioFilePath, coverDir) if coverDir else coverSource)
+    try:
+        if coverData is None: raise ValueError("the cover image could not be converted")
+        # Like an APIC frame, a cover with the same description (or the same image, since MP4 covers have none) is replaced
+        if isinstance(audio, MP4):
+            keptCovers = [] if clearCovers else [cover for cover in audio.tags.get("covr", []) if bytes(cover) != coverData]
+            audio.tags["covr"] = keptCovers + [MP4Cover(coverData, imageformat=MP4Cover.FORMAT_JPEG)]
+            return
+        
+        picture = Picture()
+        picture.type, picture.mime, picture.data = 3, "image/jpeg", coverData
+        picture.desc = f"Cover source: {coverSource}" if not usedFallback else "Couldn't find cover image"
+        with Image.open(BytesIO(coverData)) as img: picture.width, picture.height, picture.depth = img.width, img.height, 24
+        keptPictures = [] if clearCovers else [kept for kept in pictures if kept.desc != picture.desc]
+        if isinstance(audio, FLAC):
+            audio.clear_pictures()
+            for kept in keptPictures + [picture]: audio.add_picture(kept)
+        else: audio.tags["METADATA_BLOCK_PICTURE"] = [base64.b64encode(kept.write()).decode("ascii") for kept in keptPictures + [picture]]
+    except Exception as e: addToSkippedTags(skippedTags, f"There was an error adding the cover image ({coverSource}): {e}")
+
+def coverFilePath(audioFilePath: str, coverDir: str) -> str:
+    """Where an audio file's cover is saved in the cover directory, path/to/audio.mp3 becomes coverDir/path-to-audio.jpg"""
+    return os.path.join(coverDir, coverFileName(audioFilePath))+".jpg"
+
+def coverFileName(audioFilePath: str) -> str:
+    """converts path/to/image.sdkms to path-to-image"""
+    return os.path.splitext(audioFilePath)[0].replace(os.sep, '-')
+
+def saveClearedCovers(audioFilePath: str, covers: List[Tuple[str, bytes]], coverDir: str) -> None:
+    """Saves the covers about to be cleared from an audio file in the cover directory, if there is one."""
+    if not coverDir: return
+    print(Fore.YELLOW+"Saving existing cover image(s) in cover directory before clearing them in tags...")
+    clearDir = os.path.join(coverDir, "clearedCovers"+coverFileName(audioFilePath))
+    os.makedirs(clearDir, exist_ok=True)
+    saveTaggedCovers(covers, clearDir)
+
+def loadCoverImage(audioFilePath: str, coverSource: str, skippedTags: List[str], coverOptions: Dict[str, Any]) -> Tuple[Union[bytes, None], bool]:
+    """
+    Gets the compressed cover image for an audio file from its source, or NoCover.png if it can't, and saves it in the cover directory if there is one.
     
-    if not coverDir: os.remove(jpgCoverPath) # Delete compressed cover image if no cover directory is specified (not asked to be saved anywhere)
-    if wasDownloaded: os.remove(coverFileName) # Delete original cover image if it was downloaded
+    Returns:
+        Tuple[Union[bytes, None], bool]: The JPEG cover image (None if it couldn't be converted) and whether it's the fallback image.
+    """
+    coverDir = coverOptions.get("coverDir")
+    coverQuality = coverOptions.get("coverQuality", 75)
+    coverCache = coverOptions.get("coverCache")
+    prefetcher = coverOptions.get("prefetcher")
+
+    # Links are looked up in the cover cache, first already compressed at this quality and then as the original download
+    # Everything is kept in memory, the cover is only written to disk if there's a cover directory to save it in
+    isLink = bool(coverSource) and not os.path.exists(coverSource)
+    compressedKey = CoverCache.compressedKey(coverSource, coverQuality)
+    coverData = coverCache.get(compressedKey) if coverCache and isLink else None
+    usedFallback = False
 
-def downloadImage(thumbnailURL: str) -> str:
-    """Downloads a thumbnail image from a URL."""
-    response = get(thumbnailURL, stream=True)
-    response.raise_for_status() # raise exception if status code is not 200
+    if coverData is not None: print(Fore.GREEN+"Using cached cover image for:", coverSource)
+    else:
+        # Download cover image if link, otherwise use local, otherwise use fallback 
+        if coverSource:
+            if not isLink: coverImage = coverSource
+            elif coverCache and (coverImage := coverCache.get(coverSource)) is not None: print(Fore.GREEN+"Using cached thumbnail:", coverSource)
+            else:
+                try:
+                    coverImage = prefetcher.take(coverSource) if prefetcher else downloadImage(coverSource)
+                    if coverCache: coverCache.put(coverSource, coverImage)
+                except exceptions.RequestException as e:
+                    coverImage, usedFallback = "NoCover.png", True
+                    addToSkippedTags(skippedTags, f"Failed to download thumbnail ({coverSource}): {e}", alert=Fore.RED+"Download error!")
+        else:
+            coverImage, usedFallback = "NoCover.png", True
+            addToSkippedTags(skippedTags, "No cover image source provided, falling back with NoCover.png") 
 
-    tempBaseName = "temp-YTAF-cover-download"
-    mimeType = response.headers.get("Content-Type", "")
-    cover = tempBaseName+mimetypes.guess_extension(mimeType, strict=False)
-    with open(cover, "wb") as file: # stream=True makes it download in chunks which uses less memory for bigger images
-        for chunk in response.iter_content(1024): file.write(chunk)
+        coverData = jpgCompress(coverImage, coverQuality)
+        if coverData is not None and coverCache and isLink and not usedFallback: coverCache.put(compressedKey, coverData)
+
+    # Save compressed cover image in cover directory if directory is provided
+    if coverDir and coverData is not None:
+        jpgCoverPath = coverFilePath(audioFilePath, coverDir)
+        with open(jpgCoverPath, "wb") as img: img.write(coverData)
+        print("Cover image saved as", jpgCoverPath)
+    
+    return coverData, usedFallback
+
+def downloadImage(thumbnailURL: str) -> bytes:
+    """Downloads a thumbnail image from a URL into memory."""
+    waitForRateLimit("thumbnail")
+    with HTTP_SESSION.get(thumbnailURL, stream=True, timeout=THUMBNAIL_TIMEOUT) as response: # closing hands the connection back to the pool
+        response.raise_for_status() # raise exception if status code is not 200
+        cover = BytesIO()
+        for chunk in response.iter_content(THUMBNAIL_CHUNK_SIZE): cover.write(chunk)
 
     print(Fore.GREEN+"Successfully downloaded thumbnail: ", thumbnailURL)
-    print("Temp Thumbnail Filename: ", cover)
-    return cover
+    return cover.getvalue()
 
-def saveTaggedCovers(tags: ID3, coverDir):
-    """Saves all embedded cover images in a given directory."""
-    for cover in tags.getall("APIC"):
-        coverExt = mimetypes.guess_extension(cover.mime, strict=False)
+def saveTaggedCovers(covers: List[Tuple[str, bytes]], coverDir):
+    """Saves all embedded cover images, given as (mime type, image) pairs, in a given directory."""
+    for mime, data in covers:
+        coverExt = mimetypes.guess_extension(mime, strict=False)
         if coverExt:
-            coverFilePath = os.path.join(coverDir, f"cover_{sha256(cover.data).hexdigest()}.jpg")
-            with open(coverFilePath, "wb") as img: img.write(cover.data)
-            print(f"Saved image to {coverFilePath}")
-        else: print(f"Unknown image format: {cover.mime}")
+            savedCoverPath = os.path.join(coverDir, f"cover_{sha256(data).hexdigest()}.jpg")
+            with open(savedCoverPath, "wb") as img: img.write(data)
+            print(f"Saved image to {savedCoverPath}")
+        else: print(f"Unknown image format: {mime}")
 
-def jpgCompress(inputImagePath: str, outputImagePath: str, quality: int = 75) -> None:
+def jpgCompress(inputImage: Union[str, bytes], quality: int = 75) -> Union[bytes, None]:
     """
-    Converts an image to JPEG format.
+    Converts an image to JPEG format in memory.
     
     Args:
-        inputImagePath (str): The path to the input image.
-        outputImagePath (str): The path to the output image.
+        inputImage (Union[str, bytes]): The path to the input image or the image itself.
         quality (int, optional): The quality of the JPEG image. Defaults to 75. High values above 95 result in higher file sizes with a diminishing return on quality.
+    
+    Returns:
+        Union[bytes, None]: The JPEG image or None if it couldn't be converted.
     """
     try:
-        with Image.open(inputImagePath) as img:
+        with Image.open(BytesIO(inputImage) if isinstance(inputImage, bytes) else inputImage) as img:
             rgb_img = img.convert('RGB')
-            if quality < 95: rgb_img.save(outputImagePath, 'JPEG', quality = quality)
-            else: rgb_img.save(outputImagePath, 'JPEG', subsampling=0, quality=quality)
-            print("Image converted and saved as", outputImagePath, "with quality", quality)
-    except Exception as e: print("An error occurred when converting:", {e})
+            outputImage = BytesIO()
+            if quality < 95: rgb_img.save(outputImage, 'JPEG', quality = quality)
+            else: rgb_img.save(outputImage, 'JPEG', subsampling=0, quality=quality)
+            print("Image converted with quality", quality)
+            return outputImage.getvalue()
+    except Exception as e:
+        print("An error occurred when converting:", {e})
+        return None
+
+# Save data
+class JSONSaveStore:
+    """
+    The save data of a JSON save file. Every saved entry is appended to a journal next to the save file as soon as it's done,
+    so a crash only loses the entry in progress. The journal is merged into the save file every compactEvery entries and on close,
+    and loadSaveData replays whatever is left of it if a run didn't get that far.
+    """
+    def __init__(self, saveFilePath: Union[str, None], saveData: Dict[str, Dict[str, str]], compactEvery: int = 100):
+        self.saveFilePath = saveFilePath # None keeps the data in memory only
+        self.journalPath = saveFilePath + SAVE_JOURNAL_EXT if saveFilePath else None
+        self.saveData = saveData
+        self.compactEvery = compactEvery
+        self.lock = Lock() # guards the save data and journal when entries are processed concurrently
+        self.journalFile = None
+        self.journaled = 0
+    
+    def __contains__(self, audioFilePath: str) -> bool: return audioFilePath in self.saveData
+    def __len__(self) -> int: return len(self.saveData)
+    def items(self): return self.saveData.items()
+    def pathForVideoID(self, videoID: str, directory: str = None) -> None: return None # the JSON format has no place for video IDs
+
+    def upsert(self, audioFilePath: str, metadata: Dict[str, str], overwrite: bool, videoID: str = None) -> None:
+        """Saves an entry's metadata, only updating an already saved entry if overwrite is True. The JSON format has no place for videoID."""
+        with self.lock:
+            if audioFilePath in self.saveData:
+                if not overwrite: return
+                self.saveData[audioFilePath].update(metadata)
+            else: self.saveData[audioFilePath] = metadata
+            if not self.journalPath: return
+
+            if self.journalFile is None: self.journalFile = openJSONLines(self.journalPath)
+            appendJSONLine(self.journalFile, {"path": audioFilePath, "data": self.saveData[audioFilePath]})
+            self.journaled += 1
+            if self.journaled >= self.compactEvery: self.compact()
+    
+    def compact(self) -> None:
+        """Rewrites the save file with everything journaled so far and starts a new journal. Must be called with the lock held."""
+        if self.journalFile is not None:
+            self.journalFile.close()
+            self.journalFile = None
+        writeJSONAtomically(self.saveFilePath, self.saveData, indent=4)
+        os.remove(self.journalPath) # replaying it again would be harmless if this doesn't happen
+        self.journaled = 0
+
+    def close(self) -> None:
+        """Merges the journal, including one left by an unfinished run, into the save file. Nothing is written if there isn't one."""
+        with self.lock:
+            if self.journaled or (self.journalPath and os.path.exists(self.journalPath)): self.compact()
+
+class SQLiteSaveStore:
+    """
+    Save data kept in an SQLite database, indexed by audio file path and video ID, so large libraries don't have to be loaded
+    into memory and every saved entry is written on its own as soon as it's done. Has the same methods as JSONSaveStore.
+    """
+    def __init__(self, saveFilePath: str):
+        self.saveFilePath = saveFilePath
+        os.makedirs(os.path.dirname(saveFilePath) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(saveFilePath, check_same_thread=False)
+        self.lock = Lock() # one connection is shared by all threads so they have to take turns
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("PRAGMA journal_mode=WAL") # commits append to a log instead of rewriting pages
+                self.connection.execute("CREATE TABLE IF NOT EXISTS entries (path TEXT PRIMARY KEY, videoID TEXT, data TEXT NOT NULL)")
+                self.connection.execute("CREATE INDEX IF NOT EXISTS entriesVideoID ON entries (videoID)")
+        except sqlite3.DatabaseError:
+            self.connection.close()
+            raise
+    
+    def __contains__(self, audioFilePath: str) -> bool:
+        with self.lock: return self.connection.execute("SELECT 1 FROM entries WHERE path = ?", (audioFilePath,)).fetchone() is not None
+    
+    def __len__(self) -> int:
+        with self.lock: return self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+    
+    def items(self):
+        """Yields (audio file path, metadata) pairs in the order they were first saved, without loading them all at once."""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT path, data FROM entries ORDER BY rowid")
+        for audioFilePath, data in cursor: yield audioFilePath, json.loads(data)
+    
+    def get(self, audioFilePath: str) -> Union[Dict[str, str], None]:
+        with self.lock: row = self.connection.execute("SELECT data FROM entries WHERE path = ?", (audioFilePath,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def pathForVideoID(self, videoID: str, directory: str = None) -> Union[str, None]:
+        """Returns the audio file path a video was last saved under (in directory if given), or None if it was never saved."""
+        with self.lock: rows = self.connection.execute("SELECT path FROM entries WHERE videoID = ? ORDER BY rowid DESC", (videoID,)).fetchall()
+        return next((row[0] for row in rows if directory is None or os.path.dirname(row[0]) == directory), None)
+
+    def upsert(self, audioFilePath: str, metadata: Dict[str, str], overwrite: bool, videoID: str = None) -> None:
+        """Saves an entry's metadata, only updating an already saved entry if overwrite is True."""
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT data, videoID FROM entries WHERE path = ?", (audioFilePath,)).fetchone()
+            if row:
+                if not overwrite: return
+                metadata = {**json.loads(row[0]), **metadata}
+                videoID = videoID or row[1]
+            self.connection.execute(
+                "INSERT INTO entries (path, videoID, data) VALUES (?, ?, ?) ON CONFLICT (path) DO UPDATE SET videoID = excluded.videoID, data = excluded.data",
+                (audioFilePath, videoID, json.dumps(metadata))
+            )
+    
+    def importJSON(self, jsonFilePath: str, overwrite: bool = False) -> int:
+        """Adds the entries of a JSON save file and returns how many there were. Video IDs are taken from the YTAF-[id]- file names."""
+        errorType, saveData = loadSaveData(jsonFilePath)
+        if errorType == 1: raise ValueError(f"{jsonFilePath} is not a valid save file")
+        for audioFilePath, metadata in saveData.items():
+            idMatch = re.match(r"YTAF-([A-Za-z0-9_-]{11})-", os.path.basename(audioFilePath))
+            self.upsert(audioFilePath, metadata, overwrite, idMatch.group(1) if idMatch else None)
+        return len(saveData)
+    
+    def exportJSON(self, jsonFilePath: str) -> None:
+        """Writes every entry to a JSON save file in the same format ytafURL saves them in."""
+        tempFilePath = jsonFilePath+".tmp"
+        with open(tempFilePath, "w") as saveFile: # written an entry at a time so the whole database never has to be in memory
+            saveFile.write("{")
+            empty = True
+            for audioFilePath, metadata in self.items():
+                entryJSON = json.dumps(metadata, indent=4).replace("\n", "\n    ")
+                saveFile.write(("" if empty else ",") + f"\n    {json.dumps(audioFilePath)}: {entryJSON}")
+                empty = False
+            saveFile.write("}" if empty else "\n}")
+        os.replace(tempFilePath, jsonFilePath)
+
+    def close(self) -> None:
+        with self.lock: self.connection.close()
+
+# Caches
+class MetadataCache:
+    """
+    A JSON file of the verbose video info processEntryURL uses, keyed by video ID, so videos don't have to be extracted again on later runs.
+    Entries expire after a TTL and the least recently used ones are removed once the cache is full.
+    """
+    FIELDS = ("thumbnail", "description", "title", "uploader")
+
+    def __init__(self, cacheFilePath: str, ttl: float, maxEntries: int):
+        self.cacheFilePath = cacheFilePath
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        self.lock = Lock()
+        self.changed = False
+        try:
+            with open(cacheFilePath, "r") as cacheFile: cache = json.load(cacheFile)
+        except (OSError, ValueError): cache = {} # missing or corrupt caches just start empty
+        # kept in least to most recently used order so eviction can pop from the front
+        self.cache = dict(sorted(cache.items(), key=lambda item: item[1].get("lastUsed", 0)))
+    
+    def get(self, videoID: str) -> Union[Dict[str, str], None]:
+        """Returns the cached info for a video or None if it isn't cached or has expired."""
+        with self.lock:
+            cached = self.cache.pop(videoID, None)
+            if cached is None: return None
+            if time.time() - cached["fetched"] > self.ttl:
+                self.changed = True
+                return None
+            cached["lastUsed"] = time.time()
+            self.cache[videoID] = cached # move to the most recently used end
+            self.changed = True
+            return cached
+    
+    def put(self, videoID: str, info: Dict[str, Any]) -> None:
+        """Caches the used fields of a video's info, removing the least recently used videos if the cache is full."""
+        now = time.time()
+        with self.lock:
+            self.cache.pop(videoID, None)
+            self.cache[videoID] = {**{field: info.get(field) for field in self.FIELDS}, "fetched": now, "lastUsed": now}
+            while len(self.cache) > self.maxEntries: del self.cache[next(iter(self.cache))]
+            self.changed = True
+    
+    def save(self) -> None:
+        """Writes the cache to disk if anything changed."""
+        with self.lock:
+            if not self.changed: return
+            writeJSONAtomically(self.cacheFilePath, self.cache)
+            self.changed = False
+
+class CoverCache:
+    """
+    A directory of cover images named by the hash of what they were made from (the thumbnail URL, plus the quality for compressed covers)
+    so the same cover isn't downloaded or compressed again. The least recently used images are removed once it's over its size limit.
+    Copies sent to tag worker processes only add images, the process that made the cache calls trim once they're done.
+    """
+    def __init__(self, cacheDir: str, maxBytes: int):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.lock = Lock()
+        self.evicting = True # whether put removes images, a worker's copy can't since it only knows about its own images
+        os.makedirs(cacheDir, exist_ok=True)
+        self.scan()
+    
+    def __getstate__(self) -> Dict[str, Any]: # so it can be sent to tag worker processes, which each get their own lock
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.lock = Lock()
+        self.evicting = False
+
+    def scan(self) -> None:
+        """Reads the images in the cache directory. Must be called with the lock held, or before the cache is shared."""
+        # file name -> size in least to most recently used order, files are touched on use so the order carries over between runs
+        with os.scandir(self.cacheDir) as dirEntries:
+            cachedFiles = [(dirEntry.stat(), dirEntry.name) for dirEntry in dirEntries if dirEntry.is_file() and not dirEntry.name.endswith(".tmp")]
+        cachedFiles.sort(key=lambda cachedFile: cachedFile[0].st_mtime)
+        self.files = {name: stat.st_size for stat, name in cachedFiles}
+        self.totalBytes = sum(self.files.values())
+    
+    def trim(self) -> None:
+        """Rescans the cache directory for images other processes added and removes the least recently used ones over the size limit."""
+        with self.lock:
+            self.scan()
+            self.evict()
+    
+    def evict(self) -> None:
+        """Removes the least recently used images until the cache fits in its size limit. Must be called with the lock held."""
+        while self.totalBytes > self.maxBytes and self.files:
+            oldName = next(iter(self.files))
+            self.totalBytes -= self.files.pop(oldName)
+            try: os.remove(os.path.join(self.cacheDir, oldName))
+            except OSError: pass
+
+    @staticmethod
+    def compressedKey(coverSource: str, coverQuality: int) -> str:
+        """The key of a compressed cover, the original download is just keyed by its URL."""
+        return f"{coverSource}\ncoverQuality={coverQuality}"
+
+    def getPath(self, key: str) -> str:
+        return os.path.join(self.cacheDir, sha256(key.encode()).hexdigest())
+    
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self.getPath(key))
+    
+    def get(self, key: str) -> Union[bytes, None]:
+        """Returns the cached image for the key or None if it isn't cached."""
+        path = self.getPath(key)
+        try:
+            with open(path, "rb") as img: data = img.read()
+            os.utime(path)
+        except OSError: return None # not cached or removed by another run
+        with self.lock: self.files[os.path.basename(path)] = self.files.pop(os.path.basename(path), len(data))
+        return data
+    
+    def put(self, key: str, data: bytes) -> None:
+        """Caches an image under the key, removing the least recently used images if the cache is over its size limit (unless it's a worker's copy)."""
+        path = self.getPath(key)
+        name = os.path.basename(path)
+        with self.lock:
+            tempPath = f"{path}.{os.getpid()}.tmp"
+            with open(tempPath, "wb") as img: img.write(data)
+            os.replace(tempPath, path) # so other runs never read a half written image
+            self.totalBytes += len(data) - self.files.pop(name, 0)
+            self.files[name] = len(data)
+            if self.evicting: self.evict()
+
+class ThumbnailPrefetcher:
+    """
+    Downloads thumbnails in the background before they're needed for tagging so covers aren't waited on.
+    At most maxPending thumbnails are kept at once, the oldest ones that were never taken are dropped past that.
+    """
+    def __init__(self, maxPending: int, coverCache: "CoverCache" = None, coverQuality: int = 75):
+        self.maxPending = maxPending
+        self.coverCache = coverCache
+        self.coverQuality = coverQuality
+        self.executor = ThreadPoolExecutor(max_workers=min(maxPending, 8))
+        self.pending = {} # thumbnail URL -> future, oldest first
+        self.lock = Lock()
+    
+    def prefetch(self, thumbnailURL: str) -> None:
+        """Starts downloading a thumbnail unless it's a local file, already cached or already being downloaded."""
+        if not thumbnailURL or os.path.exists(thumbnailURL): return
+        if self.coverCache and (self.coverCache.contains(thumbnailURL) or self.coverCache.contains(CoverCache.compressedKey(thumbnailURL, self.coverQuality))): return
+        with self.lock:
+            if thumbnailURL in self.pending: return
+            self.pending[thumbnailURL] = self.executor.submit(downloadImage, thumbnailURL)
+            while len(self.pending) > self.maxPending: self.pending.pop(next(iter(self.pending))).cancel()
+    
+    def take(self, thumbnailURL: str) -> bytes:
+        """Returns a prefetched thumbnail, downloading it now if it wasn't prefetched. Raises the same errors as downloadImage."""
+        with self.lock: future = self.pending.pop(thumbnailURL, None)
+        if future is None or future.cancelled(): return downloadImage(thumbnailURL)
+        return future.result()
+    
+    def close(self) -> None:
+        """Stops any downloads that haven't started yet, thumbnails that were never taken are thrown away."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pending.clear()
+
+class DownloadArchive:
+    """
+    A JSON file of the audio file each video was downloaded to, across every output directory it's used with,
+    so other output directories can link to that file instead of downloading the video again.
+    """
+    def __init__(self, archiveFilePath: str):
+        self.archiveFilePath = archiveFilePath
+        self.lock = Lock()
+        self.changed = False
+        try:
+            with open(archiveFilePath, "r") as archiveFile: self.archive = json.load(archiveFile)
+        except (OSError, ValueError): self.archive = {} # missing or corrupt archives just start empty
+    
+    def find(self, videoID: str) -> Union[str, None]:
+        """Returns the archived audio file of a video or None if there isn't one or it was deleted."""
+        with self.lock:
+            archivedFilePath = self.archive.get(videoID)
+            if archivedFilePath is None or os.path.isfile(archivedFilePath): return archivedFilePath
+            del self.archive[videoID]
+            self.changed = True
+            return None
+    
+    def record(self, videoID: str, audioFilePath: str) -> None:
+        """Archives a video's audio file unless the video already has one that still exists."""
+        if not videoID: return
+        with self.lock:
+            archivedFilePath = self.archive.get(videoID)
+            if archivedFilePath is not None and os.path.isfile(archivedFilePath): return
+            self.archive[videoID] = os.path.abspath(audioFilePath)
+            self.changed = True
+    
+    def save(self) -> None:
+        """Writes the archive to disk if anything changed."""
+        with self.lock:
+            if not self.changed: return
+            writeJSONAtomically(self.archiveFilePath, self.archive, indent=4)
+            self.changed = False
+
+class OutputDirIndex:
+    """
+    The audio files in an output directory by the video ID in their YTAF-[id]- file names, read with a single directory scan
+    so checking whether a video was already downloaded doesn't need a stat and still works if its title changed.
+    """
+    def __init__(self, outputDir: str, exts: Tuple[str, ...] = ("mp3",)):
+        fileNamePattern = re.compile(rf"^YTAF-([A-Za-z0-9_-]{{11}})-.*\.(?:{'|'.join(map(re.escape, exts))})$")
+        self.files = {}
+        with os.scandir(outputDir) as dirEntries:
+            for dirEntry in dirEntries:
+                match = fileNamePattern.match(dirEntry.name)
+                if match and dirEntry.is_file(): self.files.setdefault(match.group(1), os.path.normpath(dirEntry.path))
+    
+    def covers(self, videoID: str) -> bool:
+        """Whether the index can be trusted for a video, only IDs in the usual YouTube format are, others need a file system check."""
+        return bool(videoID) and re.fullmatch(r"[A-Za-z0-9_-]{11}", videoID) is not None
+    
+    def find(self, videoID: str) -> Union[str, None]:
+        """Returns the path of the video's audio file or None if there isn't one."""
+        return self.files.get(videoID) if self.covers(videoID) else None
+    
+    def add(self, videoID: str, audioFilePath: str) -> None:
+        if self.covers(videoID): self.files[videoID] = audioFilePath
 
-def readImg(imgPath: str) -> bytes:
-    with open(imgPath, "rb") as img: return img.read()
+class RunCheckpoint:
+    """
+    A JSON lines file of the operations finished for each video of a playlist (or batch of them) downloaded to an output directory,
+    so a run that gets interrupted can be restarted without redoing them. Removed once a run gets through every entry.
+    Its first line is the operations of the run that wrote it, a run that does more than that starts over.
+    """
+    def __init__(self, checkpointDir: str, ytURL: str, outputDir: str, operations: Dict[str, Any]): # a batch's URLs are joined by newlines
+        self.checkpointPath = runFilePath(checkpointDir, ytURL, outputDir, "jsonl")
+        self.operations = operations # downloading, tagging, saving and changeableTags
+        self.lock = Lock()
+        self.checkpointFile = None
+        self.rewrite = True # whether the file has to be started over with this run's operations before anything is added to it
+        self.finished = {} # video ID -> set of finished operations: "download", "tag", "save" and "done" once the whole entry is
+        checkpointOperations = None
+        try:
+            with open(self.checkpointPath, "r") as checkpointFile:
+                for line in checkpointFile:
+                    try: record = json.loads(line)
+                    except ValueError: continue # a line cut off by a crash while it was written
+                    if "operations" in record: checkpointOperations = record["operations"]
+                    else: self.finished.setdefault(record["id"], set()).add(record["op"])
+        except OSError: return # nothing to resume
+        if checkpointOperations is None or not operationsCover(checkpointOperations, operations):
+            print(Fore.YELLOW + "Not resuming an interrupted run that didn't do all of this run's operations")
+            self.finished.clear()
+            return
+        self.rewrite = checkpointOperations != operations # what it finished still counts but anything added is only for this run's operations
+        print(Fore.YELLOW + f"Resuming an interrupted run, {sum('done' in ops for ops in self.finished.values())} entries were already finished")
+    
+    def finishedOps(self, videoID: str) -> set:
+        with self.lock: return set(self.finished.get(videoID, ()))
+    
+    def record(self, videoID: str, op: str) -> None:
+        """Records that an operation is finished for a video."""
+        if videoID is None: return
+        with self.lock:
+            if op in self.finished.get(videoID, ()): return
+            if self.checkpointFile is None: self.openFile()
+            self.finished.setdefault(videoID, set()).add(op)
+            appendJSONLine(self.checkpointFile, {"id": videoID, "op": op})
+    
+    def openFile(self) -> None:
+        """Opens the checkpoint to add to, first rewriting it with this run's operations and what it already finished if it has to be. Must be called with the lock held."""
+        if not self.rewrite:
+            self.checkpointFile = openJSONLines(self.checkpointPath)
+            return
+        os.makedirs(os.path.dirname(self.checkpointPath), exist_ok=True)
+        self.checkpointFile = open(self.checkpointPath, "w")
+        appendJSONLine(self.checkpointFile, {"operations": self.operations})
+        for videoID, ops in self.finished.items():
+            for op in ops: appendJSONLine(self.checkpointFile, {"id": videoID, "op": op})
+        self.rewrite = False
+    
+    def finish(self) -> None:
+        """Removes the checkpoint once the run has gone through every entry."""
+        with self.lock:
+            if self.checkpointFile is not None: self.checkpointFile.close()
+            self.checkpointFile = None
+            self.finished.clear()
+            try: os.remove(self.checkpointPath)
+            except FileNotFoundError: pass
+
+class PlaylistSnapshot:
+    """
+    A JSON file of a playlist's video IDs, titles and durations in playlist order as of the last sync to an output directory,
+    so the next sync only processes the videos that were added or changed since then.
+    The operations it was synced with are kept too, a sync that needs more of them than that starts over.
+    """
+    def __init__(self, snapshotDir: str, ytURL: str, outputDir: str, operations: Dict[str, Any]):
+        self.snapshotPath = runFilePath(snapshotDir, ytURL, outputDir, "json")
+        self.ytURL = ytURL
+        self.operations = operations # downloading, tagging, saving and changeableTags
+        self.listed = [] # [id, title, duration] of every entry listed this run
+        self.unchanged = 0
+        try:
+            with open(self.snapshotPath, "r") as snapshotFile: snapshot = json.load(snapshotFile)
+            self.previous = snapshot["entries"] if operationsCover(snapshot["operations"], operations) else []
+        except (OSError, ValueError, KeyError, TypeError): self.previous = [] # missing or corrupt snapshots sync everything
+        self.previousByID = {videoID: [title, duration] for videoID, title, duration in self.previous}
+
+    def diff(self, entries: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yields the entries that are new or whose title/duration changed since the last sync, leaving out the rest."""
+        for entry in entries:
+            videoID = entry.get("id")
+            self.listed.append([videoID, entry.get("title"), entry.get("duration")])
+            if videoID and self.previousByID.get(videoID) == self.listed[-1][1:]:
+                self.unchanged += 1
+                continue
+            yield entry
+
+    def removed(self) -> List[Tuple[str, str]]:
+        """The (id, title) of every video in the last sync that wasn't listed this run."""
+        listedIDs = {videoID for videoID, _, _ in self.listed}
+        return [(videoID, title) for videoID, title, _ in self.previous if videoID not in listedIDs]
+
+    def save(self, syncedIDs: set, complete: bool = True) -> None:
+        """
+        Writes the snapshot of this run's listing. Videos that weren't synced keep their last snapshot (or are left out if they're new) so they're retried next run.
+        An incomplete listing keeps the videos it didn't get to instead of treating them as removed.
+        """
+        entries, listedIDs = [], set()
+        for videoID, title, duration in self.listed:
+            if not videoID or videoID in listedIDs: continue
+            listedIDs.add(videoID)
+            if videoID in syncedIDs or self.previousByID.get(videoID) == [title, duration]: entries.append([videoID, title, duration])
+            elif videoID in self.previousByID: entries.append([videoID, *self.previousByID[videoID]])
+        if not complete: entries.extend(entry for entry in self.previous if entry[0] not in listedIDs)
+        writeJSONAtomically(self.snapshotPath, {"url": self.ytURL, "operations": self.operations, "entries": entries})
 
 # Other general helper functions
+class YoutubeDLPool:
+    """
+    Keeps warm YoutubeDL instances around so they aren't rebuilt for every entry.
+    YoutubeDL isn't thread safe so each thread gets its own instance for each set of options.
+    """
+    def __init__(self):
+        self.threadInstances = local()
+        self.instances = [] # every instance handed out, so they can all be closed at the end of a run
+        self.lock = Lock()
+        self.generation = 0 # bumped by close() so threads don't reuse instances from a previous run
+    
+    def get(self, ydlOpts: Dict[str, Any]) -> yt_dlp.YoutubeDL:
+        """Returns this thread's YoutubeDL for the given options, creating it on first use."""
+        if getattr(self.threadInstances, "generation", None) != self.generation:
+            self.threadInstances.generation, self.threadInstances.pool = self.generation, {}
+        
+        # The output template changes per entry in JSON mode so it's set on the instance instead of being part of the key
+        outtmpl = ydlOpts.get("outtmpl", "")
+        if isinstance(outtmpl, dict): outtmpl = outtmpl["default"]
+        key = json.dumps({opt: value for opt, value in ydlOpts.items() if opt != "outtmpl"}, sort_keys=True, default=repr)
+        
+        ydl = self.threadInstances.pool.get(key)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL({**ydlOpts, "outtmpl": outtmpl}) # copy since YoutubeDL changes the options it's given
+            self.threadInstances.pool[key] = ydl
+            with self.lock: self.instances.append(ydl)
+        ydl.params["outtmpl"]["default"] = outtmpl
+        return ydl
+    
+    def close(self) -> None:
+        """Closes every instance (saving cookies and closing connections) and starts fresh for the next run."""
+        with self.lock:
+            instances, self.instances = self.instances, []
+            self.generation += 1
+        for ydl in instances: ydl.close()
+
+YDL_POOL = YoutubeDLPool()
+
+class RateLimiter:
+    """
+    A token bucket that lets through rate requests per second on average and up to burst of them at once after a quiet period.
+    Shared by every thread so requests running at the same time can't add up to a burst that gets the client throttled.
+    """
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = Lock()
+    
+    def acquire(self) -> None:
+        """Waits until a request can be made."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now-self.updated)*self.rate)
+            self.updated = now
+            self.tokens -= 1 # taken now even if it has to be waited for, so the waiting happens outside the lock and in order
+            wait = -self.tokens/self.rate if self.tokens < 0 else 0
+        if wait: time.sleep(wait)
+
+class CircuitBreaker:
+    """
+    Pauses every request for CIRCUIT_COOLDOWN seconds once CIRCUIT_FAILURE_LIMIT requests in a row failed with temporary errors,
+    since YouTube or the proxy is most likely down and every entry would otherwise use up its retries one after another.
+    Requests are let through again after the pause, another failure pauses them again and a success resets the count.
+    """
+    def __init__(self, failureLimit: int = CIRCUIT_FAILURE_LIMIT, cooldown: float = CIRCUIT_COOLDOWN):
+        self.failureLimit = failureLimit
+        self.cooldown = cooldown
+        self.lock = Lock()
+        self.failures = 0
+        self.pausedUntil = 0.0
+    
+    def wait(self) -> None:
+        """Waits until requests aren't paused."""
+        with self.lock: pause = self.pausedUntil - time.monotonic()
+        if pause > 0: time.sleep(pause)
+    
+    def recordSuccess(self) -> None:
+        with self.lock: self.failures = 0
+    
+    def recordFailure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            now = time.monotonic()
+            if self.failures >= self.failureLimit and now >= self.pausedUntil:
+                self.pausedUntil = now + self.cooldown
+                print(Fore.YELLOW + f"{self.failures} requests in a row failed, pausing all requests for {self.cooldown} seconds...")
+    
+    def reset(self) -> None:
+        """Starts a run without the failures of the one before it."""
+        with self.lock: self.failures, self.pausedUntil = 0, 0.0
+
+CIRCUIT_BREAKER = CircuitBreaker()
+
+RATE_LIMITERS: Dict[str, RateLimiter] = {} # set up by setRateLimits at the start of each run
+
+def setRateLimits(rateLimits: Dict[str, Dict[str, float]], share: int = 1) -> None:
+    """Replaces the rate limiters with ones for a validated rateLimits, divided by share when several processes split them."""
+    RATE_LIMITERS.clear()
+    for kind, limit in rateLimits.items():
+        if limit: RATE_LIMITERS[kind] = RateLimiter(limit["rate"]/share, max(1, limit["burst"]/share))
+
+def waitForRateLimit(kind: str) -> None:
+    """Waits for the "metadata", "media" or "thumbnail" rate limiter, if there is one."""
+    limiter = RATE_LIMITERS.get(kind)
+    if limiter: limiter.acquire()
+
+class TranscodeReport:
+    """Adds up the time spent converting audio over a run and the bytes matching MP3 bitrates to their sources saved, to report at the end."""
+    def __init__(self):
+        self.lock = Lock()
+        self.converted = 0
+        self.seconds = 0.0
+        self.bytesSaved = 0
+    
+    def add(self, seconds: float, bytesSaved: int) -> None:
+        with self.lock:
+            self.converted += 1
+            self.seconds += seconds
+            self.bytesSaved += bytesSaved
+    
+    def report(self) -> None:
+        if not self.converted: return
+        print(Fore.BLUE + f"Converted {self.converted} file(s) in {self.seconds:.1f} seconds", end="")
+        if self.bytesSaved: print(Fore.BLUE + f", matching source bitrates saved about {self.bytesSaved/1024/1024:.1f} MiB", end="")
+        print()
+
 def addToSkipList(skipList: List[Tuple[str, str]], ytURL: str, error: Union[yt_dlp.utils.DownloadError, str]) -> None:
     """Adds an entry to the skip list."""
     if isinstance(error, yt_dlp.utils.DownloadError):
@@ -748,6 +2149,36 @@ def addToSkipList(skipList: List[Tuple[str, str]], ytURL: str, error: Union[yt_d
         if error == "Forbidden": error += ". Check your internet and/or try to download again."
     skipList.append((ytURL, error))
 
+def loadSaveStore(saveFilePath: str, compactEvery: int = 100, create: bool = True) -> Tuple[int, Union[JSONSaveStore, SQLiteSaveStore, None]]:
+    """
+    Opens a save file with the store that matches its extension, SQLiteSaveStore for .db, .sqlite and .sqlite3 and JSONSaveStore otherwise.
+    
+    Args:
+        saveFilePath (str): The path to the save file to be loaded.
+        compactEvery (int, optional): Passed on to JSONSaveStore. Defaults to 100.
+        create (bool, optional): Whether a missing SQLite save file is created. Defaults to True.
+    Returns:
+        Tuple[int, JSONSaveStore | SQLiteSaveStore | None]: The error type like loadSaveData and the store, None if it couldn't be opened.
+    """
+    if not saveFilePath.lower().endswith(SQLITE_SAVE_EXTS):
+        errorType, saveData = loadSaveData(saveFilePath)
+        return errorType, (JSONSaveStore(saveFilePath, saveData, compactEvery) if errorType != 1 else None)
+    
+    print(Fore.BLUE + "Loading save data from " + saveFilePath)
+    try:
+
+        if not os.path.exists(saveFilePath):
+            print(Fore.YELLOW + "Save file does not exist, initializing with empty data.")
+            return 0, (SQLiteSaveStore(saveFilePath) if create else None)
+        
+        return -1, SQLiteSaveStore(saveFilePath)
+
+    except sqlite3.DatabaseError:
+        print(Fore.RED + "Error loading SQLite file. Initializing with empty data.")
+        return 1, None
+
+    finally: print()
+
 def loadSaveData(saveFilePath: str) -> Tuple[int, Dict[str, Dict[str, str]]]:
     """
     Loads save data from a JSON file
@@ -756,15 +2187,20 @@ def loadSaveData(saveFilePath: str) -> Tuple[int, Dict[str, Dict[str, str]]]:
         saveFilePath (str): The path to the save file to be loaded. 
     Returns:
         Tuple[int, Dict[str, Dict[str, str]]]: A tuple containing the error type (-1: no error, 0: no save file, 1: bad save file)and the save data in json.
+        Entries in the save file's journal, left behind by a run that didn't finish, are applied on top of the save data.
     """
     print(Fore.BLUE + "Loading save data from " + saveFilePath)
     try:
 
         if not os.path.exists(saveFilePath):
+            saveData = {}
+            if replaySaveJournal(saveFilePath, saveData): return -1, saveData
             print(Fore.YELLOW + "Save file does not exist, initializing with empty data.")
-            return 0, {}
+            return 0, saveData
         
-        with open(saveFilePath, "r") as saveFile: return -1, json.load(saveFile)
+        with open(saveFilePath, "r") as saveFile: saveData = json.load(saveFile)
+        replaySaveJournal(saveFilePath, saveData)
+        return -1, saveData
 
     except:
         print(Fore.RED + "Error loading JSON file. Initializing with empty data.")
@@ -772,10 +2208,156 @@ def loadSaveData(saveFilePath: str) -> Tuple[int, Dict[str, Dict[str, str]]]:
 
     finally: print()
 
-def isConnectionError(error: yt_dlp.utils.DownloadError) -> bool:
-    """Checks if the given error is a connection error."""
+def streamSaveData(saveFilePath: str) -> Tuple[int, Union[Iterator[Tuple[str, Dict[str, str]]], None]]:
+    """
+    Like loadSaveData, but returns an iterator that decodes the save file's entries one at a time as they're needed,
+    so memory use doesn't grow with the size of the file. Entries from its journal are applied as they're reached.
+    
+    Args:
+        saveFilePath (str): The path to the save file to be read.
+    Returns:
+        Tuple[int, Iterator | None]: The error type (-1: no error, 0: no save file) and an iterator of (audio file path, metadata) pairs.
+        An invalid file isn't found until it's reached, where the iterator raises a ValueError.
+    """
+    print(Fore.BLUE + "Loading save data from " + saveFilePath)
+    journal = {}
+    replaySaveJournal(saveFilePath, journal) # only holds what was saved since the last compaction, so it's small enough to load
+    print()
+    if not os.path.exists(saveFilePath): return (-1, iter(journal.items())) if journal else (0, None)
+    
+    def readEntries() -> Iterator[Tuple[str, Dict[str, str]]]:
+        for audioFilePath, data in iterJSONObject(saveFilePath): yield audioFilePath, journal.pop(audioFilePath, data)
+        yield from journal.items() # entries that were added after the last compaction
+    return -1, readEntries()
+
+def iterJSONObject(jsonFilePath: str) -> Iterator[Tuple[str, Any]]:
+    """Yields the key value pairs of a file containing a JSON object, reading SAVE_READ_CHUNK_SIZE characters at a time."""
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"\s*")
+    with open(jsonFilePath, "r") as jsonFile:
+        buffer, position = "", 0
+
+        def parse(decode: bool) -> Any:
+            """Returns the next JSON value if decode is True or the next character otherwise, reading more of the file when needed."""
+            nonlocal buffer, position
+            while True:
+                position = whitespace.match(buffer, position).end()
+                if position < len(buffer):
+                    if not decode:
+                        position += 1
+                        return buffer[position-1]
+                    try:
+                        value, position = decoder.raw_decode(buffer, position)
+                        return value
+                    except json.JSONDecodeError as e: error = ValueError(e.msg) # the value may just not be fully read yet, its position is only within the buffer
+                else: error = ValueError("unexpected end of file")
+                chunk = jsonFile.read(SAVE_READ_CHUNK_SIZE)
+                if not chunk: raise error
+                buffer, position = buffer[position:] + chunk, 0 # only the unparsed part is kept
+
+        if parse(False) != "{": raise ValueError("save file must contain a JSON object")
+        if parse(False) == "}": return
+        position -= 1 # that was the first key's opening quote
+        while True:
+            key = parse(True)
+            if not isinstance(key, str) or parse(False) != ":": raise ValueError(f"invalid key {key!r}")
+            yield key, parse(True)
+            separator = parse(False)
+            if separator == "}": return
+            if separator != ",": raise ValueError(f"expected , or }} after {key!r} but found {separator!r}")
+
+def replaySaveJournal(saveFilePath: str, saveData: Dict[str, Dict[str, str]]) -> int:
+    """Applies the entries journaled next to a save file to its save data and returns how many there were."""
+    journalPath = saveFilePath + SAVE_JOURNAL_EXT
+    if not os.path.exists(journalPath): return 0
+
+    replayed = 0
+    with open(journalPath, "r") as journalFile:
+        for line in journalFile:
+            try: record = json.loads(line)
+            except ValueError: continue # a line cut off by a crash while it was written
+            saveData[record["path"]] = record["data"]
+            replayed += 1
+    
+    if replayed: print(Fore.YELLOW + f"Recovered {replayed} entries from an unfinished run's journal")
+    return replayed
+
+def classifyError(error: yt_dlp.utils.DownloadError) -> str:
+    """
+    Sorts a yt-dlp error into "throttled" (YouTube is limiting requests), "temporary" (a connection problem that may go away)
+    or "permanent" (private, age restricted, removed videos and so on, which retrying won't fix).
+    """
     error = str(error)
-    return any(phrase in error for phrase in ["Failed to resolve", "Failed to extract"])
+    if any(phrase in error for phrase in ERROR_PHRASES["throttled"]): return "throttled"
+    if any(phrase in error for phrase in ERROR_PHRASES["temporary"]): return "temporary"
+    return "permanent"
+
+def retryCall(call: Callable[[], Any], action: str) -> Any:
+    """
+    Calls a yt-dlp call, retrying it up to RETRY_LIMIT times with exponential backoff and jitter if it fails with a temporary error.
+    Every call waits while CIRCUIT_BREAKER has paused requests.
+    
+    Args:
+        call (Callable[[], Any]): The call to make.
+        action (str): What the call does for error messages, e.g. "downloading".
+    
+    Returns:
+        Any: What the call returned.
+    
+    Raises:
+        yt_dlp.utils.DownloadError: The error of the last attempt if it was permanent or every attempt failed.
+    """
+    for attempt in range(RETRY_LIMIT):
+        CIRCUIT_BREAKER.wait()
+        try: result = call()
+        except yt_dlp.utils.DownloadError as e:
+            errorType = classifyError(e)
+            if errorType == "permanent":
+                CIRCUIT_BREAKER.recordSuccess() # YouTube answered, it just said no
+                raise
+            CIRCUIT_BREAKER.recordFailure()
+            print(Fore.RED + f"Error {action}: {e}")
+            if attempt == RETRY_LIMIT-1: raise
+            
+            # Throttling lasts longer than a dropped connection so it backs off more, the jitter keeps concurrent entries from retrying in sync
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt * (4 if errorType == "throttled" else 1))
+            delay = random.uniform(delay/2, delay)
+            print(Fore.YELLOW + f"Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+        else:
+            CIRCUIT_BREAKER.recordSuccess()
+            return result
+
+def writeJSONAtomically(filePath: str, data: Any, indent: int = None) -> None:
+    """Writes data to a JSON file through a temporary file that replaces it, so a crash mid-write can't leave it corrupted."""
+    os.makedirs(os.path.dirname(filePath) or ".", exist_ok=True)
+    tempFilePath = filePath+".tmp"
+    with open(tempFilePath, "w") as jsonFile: json.dump(data, jsonFile, indent=indent)
+    os.replace(tempFilePath, filePath)
+
+def operationsCover(doneOperations: Dict[str, Any], operations: Dict[str, Any]) -> bool:
+    """Whether a run with doneOperations did everything a run with operations does, e.g. a tagging only run didn't download anything."""
+    return all(doneOperations[op] or not operations[op] for op in ("downloading", "tagging", "saving")) and \
+           set(operations["changeableTags"]) <= set(doneOperations["changeableTags"])
+
+def runFilePath(directory: str, ytURL: str, outputDir: str, ext: str) -> str:
+    """The path of the file kept in directory for a playlist (or batch of them, joined by newlines) downloaded to an output directory."""
+    runKey = sha256(f"{ytURL}\n{os.path.abspath(outputDir)}".encode()).hexdigest()
+    return os.path.join(directory, f"{runKey}.{ext}")
+
+def openJSONLines(filePath: str) -> TextIO:
+    """Opens a JSON lines file for appending, ending a line a crash may have cut off so it doesn't swallow the next one."""
+    os.makedirs(os.path.dirname(filePath) or ".", exist_ok=True)
+    jsonLinesFile = open(filePath, "a+")
+    if jsonLinesFile.tell():
+        jsonLinesFile.seek(jsonLinesFile.tell()-1)
+        if jsonLinesFile.read(1) != "\n": jsonLinesFile.write("\n")
+    return jsonLinesFile
+
+def appendJSONLine(jsonLinesFile: TextIO, record: Any) -> None:
+    """Writes a record as a line of a file from openJSONLines, flushed so it survives a crash right after."""
+    jsonLinesFile.write(json.dumps(record) + "\n")
+    jsonLinesFile.flush()
 
 def changeFileExt(filePath: str, newExt: str) -> str:
     """Changes the file extension of the given filename."""
@@ -812,7 +2394,7 @@ if __name__ == "__main__": # User inputs
         if boolInput("Use defaults parameters? (y/n): "):
             if mode == 0:
                 arguments = {
-                    "ytURL": strInput("Enter the YouTube playlist/video URL: "),
+                    "ytURLs": strInput("Enter the YouTube playlist/video URL(s), separated by spaces: ").split(),
                     "outputDir": strInput("Enter the directory to save the MP3 files: ")
                 }
             else: arguments = { "saveFilePath": strInput("Enter the path of the JSON save file: ") }
@@ -839,7 +2421,7 @@ if __name__ == "__main__": # User inputs
                 break
 
             arguments = { # There were too many arguments so I'm stuff them all in a dictionary
-                "ytURL": strInput("Enter the YouTube playlist/video URL: ") if mode == 0 else None,
+                "ytURLs": strInput("Enter the YouTube playlist/video URL(s), separated by spaces: ").split() if mode == 0 else None,
                 "outputDir": strInput("Enter the directory to save the MP3 files: ") if mode == 0 else None,
                 "saveFilePath": strInput("Enter the path of the JSON save file: ") if mode == 1 or saving else None,
                 "downloading": downloading,
@@ -853,7 +2435,8 @@ if __name__ == "__main__": # User inputs
                 "coverDir": input("Enter the directory to save the cover images (leave empty to not save covers): ") if "thumbnail" in changeableTags else None,
                 "coverQuality": intInput(" *Values over 95 result in higher file sizes with a diminishing return on quality*\nEnter the cover quality (0-100): ", (0, 100)) if "thumbnail" in changeableTags else 75,
                 "overwriteSave": boolInput("Overwrite data in save file? (y/n): ") if saving else False,
-                "verboseSkipList": boolInput("Verbose skip list (show all operations skipped)? (y/n): ")
+                "verboseSkipList": boolInput("Verbose skip list (show all operations skipped)? (y/n): "),
+                "maxWorkers": intInput("Enter how many videos to process at the same time (1-32): ", (1, 32)) if mode == 0 else 1
             }
 
         print("\n\n")
@@ -586,7 +586,7 @@ class YTAudioFetcherGUI(QtWidgets.QWidget):
         verboseSkipList = self.verboseSkipListSwitch.isChecked()
 
         arguDict = {
-            "ytURL": ytURL,
+            "ytURLs": ytURL.split(), # several URLs separated by spaces are processed together
             "outputDir": outputDir,
             "saveFilePath": saveFilePath,
             "downloading": downloading,
@@ -639,14 +639,14 @@ class YTAudioFetcherGUI(QtWidgets.QWidget):
 
     def outputConsoleToLabels(self, output):
         # Update status label with video index
-        # regex checks for "['Video' or 'JSON entry'] [num] of [num]"
+        # regex checks for "['Video' or 'JSON entry'] [num] of [num]", streamed JSON files don't have a total
         output = output.strip()
 
         # Truncate the buffer
         truncateLength = 80
         if len(output) >= truncateLength: output = output[:truncateLength]+"..."
 
-        bufferMatch = re.search(r"(?:Video|JSON entry) \d+ of \d+ - .*", output)
+        bufferMatch = re.search(r"(?:Video|JSON entry) \d+(?: of \d+)? - .*", output)
         if bufferMatch: self.statusLabel.setText("Processing: " + bufferMatch.group(0))
         elif not (output.startswith("Video ") or output.startswith("JSON entry ")): self.outputLabel.setText("Output:\n"+output)
 